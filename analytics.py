@@ -0,0 +1,148 @@
+import copy
+
+import numpy as np
+
+from lots import position_shares
+
+
+class PortfolioAnalytics:
+    """
+    Whole-portfolio figures computed in vectorized passes over aligned arrays.
+
+    Positions are held as parallel float64 arrays indexed like self.tickers.
+    Missing quotes are NaN and contribute nothing to value, P/L or day change,
+    but their amount invested still counts towards the total. Call reprice()
+    when new quotes arrive; the position arrays are reused. with_quotes()
+    prices a copy instead, so one unpriced instance can be kept and shared
+    between requests until the positions change.
+
+    amount_invested is the cost basis of the shares still held, so
+    profit_loss is unrealized; gains already taken on sales are passed in as
+    realized_pl and only added to the portfolio total.
+    """
+
+    def __init__(self, tickers, amount_invested, quantity=None, price=None, prev_close=None, realized_pl=None):
+        self.tickers = list(tickers)
+        self.index = {ticker: i for i, ticker in enumerate(self.tickers)}
+        n = len(self.tickers)
+        self.amount_invested = np.asarray(amount_invested, dtype=np.float64).reshape(n)
+        # Assume 1 unit per position unless told otherwise
+        self.quantity = np.ones(n) if quantity is None else np.asarray(quantity, dtype=np.float64).reshape(n)
+        self.realized_pl = np.zeros(n) if realized_pl is None else np.asarray(realized_pl, dtype=np.float64).reshape(n)
+        self.price = np.full(n, np.nan)
+        self.prev_close = np.full(n, np.nan)
+        self.reprice(price, prev_close)
+
+    @classmethod
+    def from_investments(cls, investments, quotes=None, quantity=None):
+        """Build from a Portfolio.investments dict and {ticker: {'price', 'prev_close'}} quotes"""
+        tickers = list(investments)
+        n = len(tickers)
+        amounts = np.fromiter((investments[t]['amount_invested'] for t in tickers), np.float64, n)
+        if quantity is None:
+            quantity = np.fromiter((position_shares(investments[t]) for t in tickers), np.float64, n)
+        realized = np.fromiter((investments[t].get('realized_pl', 0.0) for t in tickers), np.float64, n)
+        analytics = cls(tickers, amounts, quantity=quantity, realized_pl=realized)
+        if quotes:
+            analytics.set_quotes(quotes)
+        return analytics
+
+    def set_quotes(self, quotes):
+        """Update prices for the tickers in quotes ({ticker: {'price', 'prev_close'}}) and recompute"""
+        found = [(i, quote) for i, quote in ((self.index.get(t), q) for t, q in quotes.items())
+                 if i is not None and quote]
+        if found:
+            at = np.fromiter((i for i, _ in found), np.intp, len(found))
+            # A missing price (None) becomes NaN
+            self.price[at] = np.array([quote.get('price') for _, quote in found], dtype=np.float64)
+            self.prev_close[at] = np.array([quote.get('prev_close') for _, quote in found], dtype=np.float64)
+        self._compute()
+
+    def with_quotes(self, quotes):
+        """A priced copy sharing this instance's position arrays, which neither ever writes to"""
+        priced = copy.copy(self)
+        # One pass in ticker order fills whole aligned arrays; missing quotes and prices become NaN
+        aligned = [quotes.get(ticker) or {} for ticker in self.tickers]
+        priced.price = np.array([quote.get('price') for quote in aligned], dtype=np.float64).reshape(len(self.tickers))
+        priced.prev_close = np.array([quote.get('prev_close') for quote in aligned],
+                                     dtype=np.float64).reshape(len(self.tickers))
+        priced._compute()
+        return priced
+
+    def reprice(self, price=None, prev_close=None):
+        """Replace the whole price (and optionally prev close) arrays and recompute"""
+        if price is not None:
+            self.price = np.asarray(price, dtype=np.float64).reshape(len(self.tickers))
+        if prev_close is not None:
+            self.prev_close = np.asarray(prev_close, dtype=np.float64).reshape(len(self.tickers))
+        self._compute()
+
+    def _compute(self):
+        priced = ~np.isnan(self.price)
+        self.market_value = np.where(priced, self.quantity * np.nan_to_num(self.price), 0.0)
+        # P/L only where there is a quote; unpriced positions show no P/L
+        self.profit_loss = np.where(priced, self.market_value - self.amount_invested, np.nan)
+
+        self.total_invested = float(self.amount_invested.sum())
+        self.total_value = float(self.market_value.sum())
+        self.total_realized_pl = float(self.realized_pl.sum())
+        self.total_unrealized_pl = self.total_value - self.total_invested
+        self.total_profit_loss = self.total_unrealized_pl + self.total_realized_pl
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.weight = self.market_value / self.total_value if self.total_value else np.zeros_like(self.market_value)
+            self.return_percent = np.where(self.amount_invested > 0, self.profit_loss / self.amount_invested * 100, np.nan)
+            change = self.price - self.prev_close
+            self.change_percent = change / self.prev_close * 100
+
+        has_change = priced & ~np.isnan(self.prev_close)
+        self.day_change = np.where(has_change, self.quantity * np.nan_to_num(change), 0.0)
+        self.total_day_change = float(self.day_change.sum())
+        previous_value = self.total_value - self.total_day_change
+        self.total_day_change_percent = self.total_day_change / previous_value * 100 if previous_value else 0.0
+        self.total_return_percent = self.total_profit_loss / self.total_invested * 100 if self.total_invested else 0.0
+
+    def row(self, ticker):
+        """Per-position figures for one ticker as plain Python numbers (None for NaN)"""
+        i = self.index[ticker]
+        return {
+            'shares': float(self.quantity[i]),
+            'market_value': float(self.market_value[i]),
+            'profit_loss': _or_none(self.profit_loss[i]),
+            'realized_pl': float(self.realized_pl[i]),
+            'weight': float(self.weight[i]),
+            'return_percent': _or_none(self.return_percent[i]),
+            'day_change': float(self.day_change[i]),
+        }
+
+    def rows(self):
+        """Every position's row() figures as {field: list aligned with self.tickers}, converted in bulk"""
+        return {
+            'shares': self.quantity.tolist(),
+            'market_value': self.market_value.tolist(),
+            'profit_loss': _list_or_none(self.profit_loss),
+            'realized_pl': self.realized_pl.tolist(),
+            'weight': self.weight.tolist(),
+            'return_percent': _list_or_none(self.return_percent),
+            'day_change': self.day_change.tolist(),
+        }
+
+    def totals(self):
+        return {
+            'total_invested': self.total_invested,
+            'current_value': self.total_value,
+            'profit_loss': self.total_profit_loss,
+            'unrealized_pl': self.total_unrealized_pl,
+            'realized_pl': self.total_realized_pl,
+            'return_percent': self.total_return_percent,
+            'day_change': self.total_day_change,
+            'day_change_percent': self.total_day_change_percent,
+        }
+
+
+def _or_none(value):
+    return None if np.isnan(value) else float(value)
+
+
+def _list_or_none(values):
+    return np.where(np.isnan(values), None, values).tolist()
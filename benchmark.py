@@ -0,0 +1,289 @@
+"""
+Offline benchmarks for worker startup and the dashboard, quote and persistence paths.
+
+Startup is timed in fresh interpreters importing main; everything else runs
+in-process against a StubProvider with configurable latency and failure
+rate, so results don't depend on the network and repeat from run to run.
+Each code path is swept over portfolio sizes and concurrency levels;
+latency percentiles and throughput are printed and saved to
+bench_results/<commit>.json for comparison between commits:
+
+    python benchmark.py --sizes 10,100,1000,10000 --concurrency 1,8,32
+    python benchmark.py --compare bench_results/<old>.json bench_results/<new>.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, redirect_stdout
+from unittest import mock
+
+# Don't let importing the app start background polling against real providers
+os.environ.setdefault("FINSIGHT_BACKGROUND_REFRESH", "0")
+
+import numpy as np
+
+import lots
+import persistence
+import utils
+from portfolio import Portfolio
+from providers import ProviderChain, StubProvider
+from storage import SQLiteStorage
+from symbol_index import SymbolIndex
+
+RESULTS_DIR = "bench_results"
+PATHS = ("startup", "summary", "index", "prices", "save_investments")
+# Paths whose cost depends on the quote cache; they also get a cold run
+QUOTE_PATHS = ("summary", "index", "prices")
+
+
+def make_investments(size):
+    """size positions of 10 shares each, named T00000, T00001, ..."""
+    position = lots.buy(None, 10, 1000.0, day=19000)
+    return {f"T{i:05d}": dict(position) for i in range(size)}
+
+
+def summarize(latencies, wall, errors):
+    """Percentiles in milliseconds and calls per second"""
+    ms = np.asarray(latencies) * 1000
+    return {
+        'calls': len(latencies),
+        'errors': errors,
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+        'mean_ms': float(ms.mean()),
+        'throughput': len(latencies) / wall if wall else 0.0,
+    }
+
+
+def measure(func, concurrency, calls):
+    """Run func calls times spread over concurrency threads"""
+    latencies = []
+    errors = []
+
+    def worker(count):
+        for _ in range(count):
+            started = time.perf_counter()
+            try:
+                func()
+            except Exception as e:
+                errors.append(e)
+            latencies.append(time.perf_counter() - started)
+
+    shares = [calls // concurrency + (1 if i < calls % concurrency else 0) for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, [n for n in shares if n]))
+    return summarize(latencies, time.perf_counter() - started, len(errors))
+
+
+def measure_startup(runs):
+    """Seconds for a fresh interpreter to import main, with background work switched off"""
+    code = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+    env = dict(os.environ, FINSIGHT_BACKGROUND_REFRESH="0")
+    directory = os.path.dirname(os.path.abspath(__file__))
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, "-c", code], cwd=directory, env=env, text=True)
+        latencies.append(float(output.split()[-1]))
+    return summarize(latencies, time.perf_counter() - started, 0)
+
+
+class OfflineEnvironment:
+    """
+    Stub provider, temporary storage and patched module state for one portfolio size.
+
+    Use as a context manager; code paths are then available as callables.
+    """
+
+    def __init__(self, size, latency, failure_rate, seed=0):
+        self.size = size
+        self.provider = StubProvider(latency=latency, failure_rate=failure_rate, seed=seed)
+        self.investments = make_investments(size)
+        self.tickers = list(self.investments)
+        self._stack = ExitStack()
+
+    def __enter__(self):
+        tmpdir = self._stack.enter_context(tempfile.TemporaryDirectory())
+        patches = [
+            mock.patch.object(utils, "_quote_providers", ProviderChain([self.provider])),
+            mock.patch.object(utils, "_symbol_index", SymbolIndex(os.path.join(tmpdir, "symbols.json"), save_delay=0)),
+            mock.patch.object(persistence, "DATA_PATH", os.path.join(tmpdir, "portfolio.json")),
+            mock.patch.object(persistence, "JOURNAL_PATH", os.path.join(tmpdir, "portfolio.journal")),
+            mock.patch.object(persistence, "LOCK_PATH", os.path.join(tmpdir, "portfolio.lock")),
+        ]
+        for patch in patches:
+            self._stack.enter_context(patch)
+
+        self.storage = SQLiteStorage(os.path.join(tmpdir, "finsight.db"))
+        self.storage.import_investments(None, self.investments)
+
+        import main
+        self._stack.enter_context(mock.patch.object(main, "storage", self.storage))
+        self.app = main.app
+        utils.clear_cache()
+        return self
+
+    def __exit__(self, *exc):
+        utils.clear_cache()
+        self._stack.close()
+
+    def path(self, name):
+        if name == "summary":
+            return lambda: Portfolio(storage=self.storage).get_portfolio_summary()
+        if name == "index":
+            return lambda: self._check(self.app.test_client().get("/"))
+        if name == "prices":
+            return lambda: self._check(self.app.test_client().post("/prices", json={"tickers": self.tickers}))
+        if name == "save_investments":
+            return lambda: persistence.save_investments(self.investments)
+        raise ValueError(f"Unknown benchmark path: {name}")
+
+    @staticmethod
+    def _check(response):
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+
+
+def run(sizes, concurrency_levels, paths, calls, cold_runs, latency, failure_rate, log=print, verbose=False,
+        startup_runs=5):
+    results = []
+    if "startup" in paths and startup_runs:
+        # Doesn't depend on the portfolio, so measured once rather than per size
+        results.append(dict(path="startup", size=0, concurrency=1, mode="cold", **measure_startup(startup_runs)))
+        log(_format_row(results[-1]))
+        paths = [p for p in paths if p != "startup"]
+    with open(os.devnull, 'w') as devnull:
+        def timed(func, concurrency, count):
+            if verbose:
+                return measure(func, concurrency, count)
+            # The app reports every simulated provider failure; keep that out of the results
+            with redirect_stdout(devnull):
+                return measure(func, concurrency, count)
+
+        for size in sizes:
+            with OfflineEnvironment(size, latency, failure_rate) as env:
+                for name in paths:
+                    func = env.path(name)
+                    if name in QUOTE_PATHS and cold_runs:
+                        def cold():
+                            utils.clear_cache()
+                            func()
+                        stats = timed(cold, 1, cold_runs)
+                        results.append(dict(path=name, size=size, concurrency=1, mode="cold", **stats))
+                        log(_format_row(results[-1]))
+                    # Warm the cache once so the sweep measures steady state
+                    timed(func, 1, 1)
+                    for concurrency in concurrency_levels:
+                        stats = timed(func, concurrency, max(calls, concurrency))
+                        results.append(dict(path=name, size=size, concurrency=concurrency, mode="warm", **stats))
+                        log(_format_row(results[-1]))
+    return results
+
+
+def _format_row(row):
+    return (f"{row['path']:<17} {row['size']:>6} {row['mode']:<5} c={row['concurrency']:<3} "
+            f"p50={row['p50_ms']:9.2f}ms p95={row['p95_ms']:9.2f}ms p99={row['p99_ms']:9.2f}ms "
+            f"{row['throughput']:9.1f}/s errors={row['errors']}")
+
+
+def current_commit():
+    """Short hash of HEAD, with -dirty if the tree has uncommitted changes"""
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+        dirty = subprocess.call(["git", "diff", "--quiet", "HEAD"]) != 0
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+def save_results(results, params, directory=RESULTS_DIR):
+    commit = current_commit()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{commit}.json")
+    with open(path, 'w') as f:
+        json.dump({
+            'commit': commit,
+            'timestamp': time.time(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'params': params,
+            'results': results,
+        }, f, indent=2)
+    return path
+
+
+def compare(old_path, new_path, log=print):
+    """Print p50/p95 and throughput of two result files side by side"""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    def key(row):
+        return (row['path'], row['size'], row['mode'], row['concurrency'])
+
+    before = {key(row): row for row in old['results']}
+    log(f"{old['commit']} -> {new['commit']}")
+    for row in new['results']:
+        base = before.get(key(row))
+        if base is None:
+            continue
+        ratio = row['p95_ms'] / base['p95_ms'] if base['p95_ms'] else float('inf')
+        log(f"{row['path']:<17} {row['size']:>6} {row['mode']:<5} c={row['concurrency']:<3} "
+            f"p50 {base['p50_ms']:8.2f} -> {row['p50_ms']:8.2f}ms  "
+            f"p95 {base['p95_ms']:8.2f} -> {row['p95_ms']:8.2f}ms ({ratio:5.2f}x)  "
+            f"{base['throughput']:8.1f} -> {row['throughput']:8.1f}/s")
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks with a stub quote provider")
+    parser.add_argument("--sizes", type=_int_list, default=[10, 100, 1000, 10000], help="portfolio sizes")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8, 32], help="concurrent callers")
+    parser.add_argument("--paths", default=",".join(PATHS), help="code paths to run")
+    parser.add_argument("--calls", type=int, default=20, help="calls per measurement")
+    parser.add_argument("--cold-runs", type=int, default=1, help="cold-cache calls per quote path and size")
+    parser.add_argument("--startup-runs", type=int, default=5, help="fresh interpreters timed importing main")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per stub provider request")
+    parser.add_argument("--failure-rate", type=float, default=0.01, help="share of stub requests that fail")
+    parser.add_argument("--output", default=RESULTS_DIR, help="directory for the results file")
+    parser.add_argument("--no-save", action="store_true", help="only print results")
+    parser.add_argument("--verbose", action="store_true", help="show the app's own output")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    paths = [p.strip() for p in args.paths.split(",") if p.strip()]
+    params = {
+        'sizes': args.sizes,
+        'concurrency': args.concurrency,
+        'paths': paths,
+        'calls': args.calls,
+        'cold_runs': args.cold_runs,
+        'startup_runs': args.startup_runs,
+        'latency': args.latency,
+        'failure_rate': args.failure_rate,
+    }
+    results = run(args.sizes, args.concurrency, paths, args.calls, args.cold_runs,
+                  args.latency, args.failure_rate, verbose=args.verbose, startup_runs=args.startup_runs)
+    if not args.no_save:
+        print(f"Saved {save_results(results, params, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import os
+import sqlite3
+import threading
+
+
+class SQLiteConnections:
+    """
+    One WAL-mode connection per thread to an SQLite file.
+
+    sqlite3 connections must not be shared across threads, nor reused by a
+    child after fork (the parent's locks and file handles come along), so a
+    thread opens its own on first use and again if it finds itself in a new
+    process. The file's directory is created if needed.
+    """
+
+    def __init__(self, path, busy_timeout=5.0, synchronous="NORMAL"):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.synchronous = synchronous
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self):
+        """This thread's connection, opened in this process"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
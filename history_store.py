@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+from datetime import date
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking is available
+    fcntl = None
+
+# One file of daily bars per ticker
+HISTORY_DIR = "data/history"
+# Days of history to fetch for a ticker that has nothing stored yet
+INITIAL_DAYS = 30
+# Don't ask the provider for new bars more often than this, per ticker
+MIN_REFRESH_INTERVAL = 15 * 60
+# Today's bar is still trading; re-fetch it once it is older than this (the quote TTL)
+LIVE_BAR_TTL = 5 * 60
+
+# date is days since 1970-01-01; every field is 8 bytes so records stay aligned
+BAR_DTYPE = np.dtype([
+    ('date', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+])
+
+_EMPTY = np.empty(0, dtype=BAR_DTYPE)
+
+
+def bars_from_frame(frame):
+    """Convert a yfinance history() DataFrame into a BAR_DTYPE array"""
+    if frame is None or frame.empty:
+        return _EMPTY
+    bars = np.empty(len(frame), dtype=BAR_DTYPE)
+    bars['date'] = np.array([ts.date() for ts in frame.index], dtype='datetime64[D]').astype('<i8')
+    for field, column in (('open', 'Open'), ('high', 'High'), ('low', 'Low'),
+                          ('close', 'Close'), ('volume', 'Volume')):
+        bars[field] = frame[column].to_numpy(dtype='f8', na_value=np.nan) if column in frame else np.nan
+    # Rows without a close (e.g. a missing symbol in a batch download) are useless
+    return bars[~np.isnan(bars['close'])]
+
+
+def today_epoch_day():
+    """Today's date in the same units as the 'date' field"""
+    return int(np.datetime64(date.today(), 'D').astype('<i8'))
+
+
+class HistoryStore:
+    """
+    Daily OHLCV bars per ticker in flat binary files of BAR_DTYPE records.
+
+    bars() returns a read-only memory map, so bars['close'] and friends are
+    zero-copy views of the file. update() only asks the provider for bars from
+    the last stored date onwards; the last bar is rewritten in place while the
+    day is still trading (at most every live_bar_ttl seconds) and new dates
+    are appended.
+    """
+
+    def __init__(self, directory=HISTORY_DIR, fetch_bars=None, min_refresh_interval=MIN_REFRESH_INTERVAL,
+                 live_bar_ttl=LIVE_BAR_TTL):
+        self.directory = directory
+        # fetch_bars(ticker, start) -> BAR_DTYPE array; start is a datetime.date or None
+        self.fetch_bars = fetch_bars
+        self.min_refresh_interval = min_refresh_interval
+        self.live_bar_ttl = live_bar_ttl
+        self._maps = {}
+        self._last_checked = {}
+        self._lock = threading.Lock()
+
+    def path(self, ticker):
+        return os.path.join(self.directory, f"{ticker}.bars")
+
+    def bars(self, ticker):
+        """All stored bars for ticker, oldest first, as a read-only memory map"""
+        path = self.path(ticker)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return _EMPTY
+        count = size // BAR_DTYPE.itemsize
+        if count == 0:
+            return _EMPTY
+        with self._lock:
+            cached = self._maps.get(ticker)
+            if cached is not None and cached[0] == count:
+                return cached[1]
+            bars = np.memmap(path, dtype=BAR_DTYPE, mode='r', shape=(count,))
+            self._maps[ticker] = (count, bars)
+            return bars
+
+    def last_date(self, ticker):
+        bars = self.bars(ticker)
+        return int(bars['date'][-1]) if len(bars) else None
+
+    def update(self, ticker, force=False):
+        """Fetch bars newer than what is stored (throttled) and return all bars.
+        Today's bar is re-fetched once it is older than live_bar_ttl."""
+        now = time.time()
+        last = self.last_date(ticker)
+        checked = self._last_checked.get(ticker, 0)
+        if last is not None and last >= today_epoch_day():
+            # Another worker may have rewritten today's bar more recently than we checked
+            try:
+                checked = max(checked, os.path.getmtime(self.path(ticker)))
+            except OSError:
+                pass
+            interval = self.live_bar_ttl
+        else:
+            interval = self.min_refresh_interval
+        if not force and now - checked < interval:
+            return self.bars(ticker)
+        self._last_checked[ticker] = now
+
+        if last is None:
+            start = date.fromordinal(date.today().toordinal() - INITIAL_DAYS)
+        else:
+            start = np.datetime64(last, 'D').astype(object)
+
+        try:
+            new_bars = self.fetch_bars(ticker, start)
+        except Exception as e:
+            print(f"History fetch error for {ticker}: {e}")
+            return self.bars(ticker)
+        self.append(ticker, new_bars)
+        return self.bars(ticker)
+
+    def append(self, ticker, new_bars):
+        """Store bars dated on or after the last stored bar; an equal date replaces it"""
+        if new_bars is None or len(new_bars) == 0:
+            return 0
+        new_bars = np.sort(np.asarray(new_bars, dtype=BAR_DTYPE), order='date', kind='stable')
+        # Keep the last of any duplicated dates
+        keep = np.append(new_bars['date'][1:] != new_bars['date'][:-1], True)
+        new_bars = new_bars[keep]
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(ticker)
+
+        # The file only ever grows or has its last record overwritten, so memory
+        # maps held by readers in this or other processes stay valid
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            # Re-read the tail under the lock; another worker may have appended.
+            # A torn record from a crash is ignored and overwritten.
+            end = os.fstat(fd).st_size
+            size = end - end % BAR_DTYPE.itemsize
+            last = None
+            if size:
+                tail = os.pread(fd, BAR_DTYPE.itemsize, size - BAR_DTYPE.itemsize)
+                last = int(np.frombuffer(tail, dtype=BAR_DTYPE)['date'][0])
+
+            if last is not None:
+                new_bars = new_bars[new_bars['date'] >= last]
+            if len(new_bars) == 0:
+                return 0
+            offset = size
+            if last is not None and new_bars['date'][0] == last:
+                # Still-forming (or corrected) bar for the last stored day
+                offset -= BAR_DTYPE.itemsize
+            os.pwrite(fd, new_bars.tobytes(), offset)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+        with self._lock:
+            self._maps.pop(ticker, None)
+        return len(new_bars)
+
+    def previous_close(self, ticker):
+        """Close of the bar before the latest one, matching history(period="2d")['Close'][-2]"""
+        closes = self.bars(ticker)['close']
+        return float(closes[-2]) if len(closes) >= 2 else None
+
+    def latest_close(self, ticker):
+        closes = self.bars(ticker)['close']
+        return float(closes[-1]) if len(closes) else None
@@ -6,12 +6,13 @@ import secrets
 import time
 import re
 from datetime import datetime
+from user_store import get_user_store, UserExistsError
 
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(32)  # Secure secret key
 
-# In-memory user store: {username: {first_name, last_name, dob, email, password_hash, created_at, failed_attempts, lockout_until}}
-users = {}
+# Accounts (first_name, last_name, dob, email, password_hash, created_at, failed_attempts,
+# lockout_until) are kept in SQLite by user_store.py, shared by every worker process
 
 # Session timeout (30 minutes)
 SESSION_TIMEOUT = 30 * 60
@@ -57,27 +58,6 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def is_account_locked(username):
-    """Check if account is currently locked"""
-    if username not in users:
-        return False
-    
-    user = users[username]
-    if 'lockout_until' in user and user['lockout_until']:
-        if time.time() < user['lockout_until']:
-            return True
-        else:
-            # Lockout expired, reset attempts
-            user['failed_attempts'] = 0
-            user['lockout_until'] = None
-    
-    return False
-
-def lock_account(username):
-    """Lock user account after too many failed attempts"""
-    if username in users:
-        users[username]['lockout_until'] = time.time() + LOCKOUT_DURATION
-
 def get_flash_messages_html():
     """Generate HTML for flash messages"""
     messages_html = ""
@@ -90,7 +70,7 @@ def get_flash_messages_html():
 @login_required
 def index():
     username = session['username']
-    user_data = users.get(username, {})
+    user_data = get_user_store().get(username) or {}
     full_name = f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip()
     
     return f"""
@@ -157,27 +137,25 @@ def register():
             flash(message, 'error')
             return redirect(url_for('register'))
 
-        if username in users:
-            flash('Username already exists. Please choose another.', 'error')
-            return redirect(url_for('register'))
-        
-        # Check if email already exists
-        for user_data in users.values():
-            if user_data['email'] == email:
+        # Create user account; the store's unique indexes reject a taken username or email
+        try:
+            get_user_store().create({
+                'username': username,
+                'first_name': first_name,
+                'last_name': last_name,
+                'dob': dob,
+                'email': email,
+                'password_hash': generate_password_hash(password),
+                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'failed_attempts': 0,
+                'lockout_until': None
+            })
+        except UserExistsError as e:
+            if e.field == 'email':
                 flash('Email already registered. Please use another email.', 'error')
-                return redirect(url_for('register'))
-
-        # Create user account
-        users[username] = {
-            'first_name': first_name,
-            'last_name': last_name,
-            'dob': dob,
-            'email': email,
-            'password_hash': generate_password_hash(password),
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'failed_attempts': 0,
-            'lockout_until': None
-        }
+            else:
+                flash('Username already exists. Please choose another.', 'error')
+            return redirect(url_for('register'))
         
         flash('Account created successfully! Please login.', 'success')
         return redirect(url_for('login'))
@@ -263,36 +241,37 @@ def login():
             flash('Username and password are required.', 'error')
             return redirect(url_for('login'))
 
-        if username not in users:
+        store = get_user_store()
+        user = store.get(username)
+        if user is None:
             flash('Invalid username or password.', 'error')
             return redirect(url_for('login'))
 
         # Check if account is locked
-        if is_account_locked(username):
-            lockout_time = users[username]['lockout_until']
-            remaining_time = int((lockout_time - time.time()) / 60)
+        if user['lockout_until'] and time.time() < user['lockout_until']:
+            remaining_time = int((user['lockout_until'] - time.time()) / 60)
             flash(f'Account locked due to too many failed attempts. Try again in {remaining_time} minutes.', 'error')
             return redirect(url_for('login'))
-
-        user = users[username]
         
         if check_password_hash(user['password_hash'], password):
             # Successful login
             session['username'] = username
             session['login_time'] = time.time()
-            user['failed_attempts'] = 0  # Reset failed attempts
-            user['lockout_until'] = None
+            # Reset failed attempts
+            if user['failed_attempts'] or user['lockout_until']:
+                store.reset_failed_logins(username)
             flash(f'Welcome back, {user["first_name"]}!', 'success')
             return redirect(url_for('index'))
         else:
             # Failed login
-            user['failed_attempts'] = user.get('failed_attempts', 0) + 1
+            failed_attempts, _ = store.record_failed_login(
+                username, MAX_LOGIN_ATTEMPTS, LOCKOUT_DURATION, time.time()
+            )
             
-            if user['failed_attempts'] >= MAX_LOGIN_ATTEMPTS:
-                lock_account(username)
+            if failed_attempts >= MAX_LOGIN_ATTEMPTS:
                 flash(f'Account locked due to {MAX_LOGIN_ATTEMPTS} failed login attempts. Please try again in 15 minutes.', 'error')
             else:
-                remaining_attempts = MAX_LOGIN_ATTEMPTS - user['failed_attempts']
+                remaining_attempts = MAX_LOGIN_ATTEMPTS - failed_attempts
                 flash(f'Invalid username or password. {remaining_attempts} attempts remaining.', 'error')
             
             return redirect(url_for('login'))
@@ -0,0 +1,99 @@
+import base64
+import time
+
+import numpy as np
+
+# One purchase lot: trade date (days since 1970-01-01), shares held, total cost of those shares.
+# 24 bytes per lot, versus several hundred for a dict per lot.
+LOT_DTYPE = np.dtype([
+    ('date', '<i8'),
+    ('shares', '<f8'),
+    ('cost', '<f8'),
+])
+
+
+def decode_lots(record):
+    """
+    Lots of a position record as a read-only LOT_DTYPE array, oldest first.
+
+    Records store lots as base64 of the packed array. Positions created before
+    lots existed only have amount_invested; they are read as a single lot of
+    one share costing that amount, which is what the old valuation assumed.
+    """
+    encoded = record.get('lots')
+    if encoded is None:
+        return np.array([(0, 1.0, record.get('amount_invested', 0.0))], dtype=LOT_DTYPE)
+    return np.frombuffer(base64.b64decode(encoded), dtype=LOT_DTYPE)
+
+
+def encode_lots(lots):
+    return base64.b64encode(np.ascontiguousarray(lots, dtype=LOT_DTYPE).tobytes()).decode('ascii')
+
+
+def position_shares(record):
+    """Total shares still held in a position record"""
+    shares = record.get('shares')
+    if shares is not None:
+        return shares
+    # Written before the total was stored next to the lots
+    return float(decode_lots(record)['shares'].sum())
+
+
+def buy(record, shares, cost, day=None):
+    """Return record (or a new one) with a lot of shares bought for cost added"""
+    if shares <= 0:
+        raise ValueError("Shares must be positive")
+    day = _today() if day is None else day
+    lots = decode_lots(record) if record is not None else np.empty(0, dtype=LOT_DTYPE)
+    lots = np.append(lots, np.array([(day, shares, cost)], dtype=LOT_DTYPE))
+
+    record = dict(record) if record is not None else {}
+    return _with_lots(record, lots)
+
+
+def sell(record, shares, proceeds):
+    """
+    Sell shares first-in-first-out; returns the updated record and the realized P/L.
+
+    The cost of the shares sold comes off amount_invested and the gain or loss
+    is added to realized_pl.
+    """
+    lots = decode_lots(record).copy()
+    held = lots['shares'].sum()
+    if shares <= 0:
+        raise ValueError("Shares must be positive")
+    if shares > held + 1e-9:
+        raise ValueError(f"Cannot sell {shares:g} shares, only {held:g} held")
+
+    # Shares still held after each lot is fully consumed, in FIFO order
+    remaining_after = held - np.cumsum(lots['shares'])
+    keep_from = np.searchsorted(-remaining_after, -(held - shares), side='left')
+    consumed_cost = lots['cost'][:keep_from].sum()
+
+    kept = lots[keep_from:]
+    if len(kept):
+        # Partially consume the first surviving lot
+        left_in_lot = lots['shares'][:keep_from + 1].sum() - shares
+        fraction = left_in_lot / kept['shares'][0] if kept['shares'][0] else 0.0
+        consumed_cost += kept['cost'][0] * (1 - fraction)
+        kept['cost'][0] *= fraction
+        kept['shares'][0] = left_in_lot
+        kept = kept[kept['shares'] > 1e-12]
+
+    realized = proceeds - consumed_cost
+    record = dict(record)
+    record['realized_pl'] = record.get('realized_pl', 0.0) + realized
+    return _with_lots(record, kept), realized
+
+
+def _with_lots(record, lots):
+    record['lots'] = encode_lots(lots)
+    # Kept in step with the lots so everything reading amount_invested stays correct,
+    # and so valuing a position never has to decode its lots
+    record['amount_invested'] = float(lots['cost'].sum())
+    record['shares'] = float(lots['shares'].sum())
+    return record
+
+
+def _today():
+    return int(time.time() // 86400)
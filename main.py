@@ -1,29 +1,153 @@
-from flask import Flask, request, render_template, redirect, url_for, session, flash, jsonify, get_flashed_messages
+import json
+import os
+from flask import Flask, Response, g, request, render_template, redirect, url_for, session, flash, jsonify, get_flashed_messages
 from flask_cors import CORS
 from portfolio import Portfolio
-from utils import get_multiple_stock_prices, StockPriceError
+from storage import get_default_storage
+from utils import (
+    get_multiple_stock_prices, iter_stock_prices, quote_versions, start_prewarm, QuoteRefresher, StockPriceError
+)
+from streaming import QuotePoller, event_stream
+import metrics
+import tracing
+from response_cache import ResponseCache, make_etag
 
 app = Flask(__name__)
 app.secret_key = "your_secret_key"  # Replace with a strong secret key
 CORS(app)
 
-portfolio = Portfolio()
+storage = get_default_storage()
+
+def get_portfolio():
+    """
+    Portfolio of the logged-in user, loading only that user's positions.
+    The JSON backend has one shared portfolio, reloaded if another worker changed it.
+    """
+    return Portfolio(user=session.get("username"), storage=storage)
+
+# Keep quotes for held tickers warm so page loads are served from cache. Nothing heavy
+# happens at import: the provider, symbol index and held quotes are loaded in the
+# background (FINSIGHT_PREWARM) and the refresher takes over from there.
+quote_refresher = QuoteRefresher(storage.held_tickers)
+if os.environ.get("FINSIGHT_BACKGROUND_REFRESH", "1") != "0":
+    start_prewarm(quote_refresher)
+
+# Shared by every open dashboard: one provider request per poll however many pages are open
+stream_poller = QuotePoller()
+
+# Rendered / and /prices bodies, reused while neither positions nor quotes change
+response_cache = ResponseCache()
+
+@metrics.REGISTRY.collector
+def _collect_response_cache_metrics():
+    return [
+        ("finsight_response_cache_hits_total", "counter", "Responses served from the rendered-response cache",
+         [({}, response_cache.hits)]),
+        ("finsight_response_cache_misses_total", "counter", "Cacheable responses that had to be rendered",
+         [({}, response_cache.misses)]),
+    ]
+
+@app.before_request
+def start_timer():
+    g.timings, g.timings_token = tracing.start_request()
+    if tracing.should_profile(request.args.get("profile")):
+        profiler = tracing.RequestProfiler()
+        if profiler.start():
+            g.profiler = profiler
+
+@app.after_request
+def record_timing(response):
+    timings = g.get("timings")
+    if timings is None:
+        return response
+    # The route pattern, not the path, so the number of series stays bounded
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    metrics.HTTP_REQUEST_LATENCY.observe(timings.elapsed(), route, request.method, str(response.status_code))
+    response.headers["Server-Timing"] = timings.server_timing()
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        response.headers["X-Profile"] = os.path.basename(profiler.stop(f"{request.method}-{route}"))
+    return response
+
+@app.teardown_request
+def finish_timer(exc):
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        # The view raised before after_request could stop it
+        profiler.stop("failed")
+    token = g.pop("timings_token", None)
+    if token is not None:
+        tracing.finish_request(token)
 
 # In-memory user store for demo (replace with persistent storage in production)
 users = {}
 
+def cached_response(parts, get_versions, render, mimetype):
+    """
+    Response with an ETag over parts and the quote versions it was built from.
+
+    get_versions() returns the cached quote versions the response depends on,
+    or None while any of them is missing or expired (rendering then has to go
+    to a provider, so nothing is reused). A matching If-None-Match gets 304;
+    a recent identical response is served from memory; otherwise render() is
+    called and its bytes kept if no quote changed while it ran.
+    """
+    before = get_versions()
+    if before is None:
+        return Response(render(), mimetype=mimetype)
+    etag = make_etag(parts, before)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        body = response_cache.get(etag)
+        if body is None:
+            body = render()
+            if get_versions() != before:
+                # A quote was refreshed mid-render, so the body may not match the tag
+                return Response(body, mimetype=mimetype)
+            response_cache.set(etag, body)
+        response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    # Per user, and always revalidated so a refreshed quote shows on the next poll
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
 @app.route("/", methods=["GET"])
 def index():
-    summary = portfolio.get_portfolio_summary()
-    total_invested = portfolio.calculate_total_invested()
-    current_value = portfolio.calculate_current_value()
-    profit_loss = portfolio.calculate_profit_loss()
-    return render_template(
-        "view_portfolio.html",
-        portfolio=summary,
-        total_invested=total_invested,
-        current_value=current_value,
-        profit_loss=profit_loss
+    portfolio = get_portfolio()
+
+    def render():
+        # One quote sweep per page load; summary and totals share the same snapshot
+        snapshot = portfolio.get_snapshot()
+        with tracing.span("render"):
+            return render_template(
+                "view_portfolio.html",
+                portfolio=snapshot.summary,
+                total_invested=snapshot.total_invested,
+                current_value=snapshot.current_value,
+                profit_loss=snapshot.profit_loss,
+                day_change=snapshot.day_change,
+                day_change_percent=snapshot.day_change_percent,
+                realized_pl=snapshot.realized_pl
+            )
+
+    # Tag a snapshot of the positions rather than the live dict
+    positions = {ticker: dict(record) for ticker, record in portfolio.investments.items()}
+    return cached_response(
+        (request.path, portfolio.user, positions),
+        lambda: quote_versions(positions, full=True),
+        render, "text/html"
+    )
+
+@app.route("/stream", methods=["GET"])
+def stream():
+    """Server-Sent Events with the rows whose price changed and fresh totals"""
+    user = session.get("username")
+    subscription = stream_poller.subscribe(lambda: list(storage.load(user)))
+    return Response(
+        event_stream(subscription, lambda: storage.load(user), on_close=stream_poller.unsubscribe),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 @app.route("/add", methods=["GET"])
@@ -37,12 +161,29 @@ def add_investment():
     amount = data.get("amount")
     if not ticker or amount is None:
         return jsonify({"error": "Missing ticker or amount"}), 400
+    shares = data.get("shares")
     try:
-        portfolio.add_investment(ticker, float(amount))
+        get_portfolio().add_investment(ticker, float(amount), float(shares) if shares is not None else None)
         return jsonify({"message": f"Added {ticker} with amount {amount}"}), 200
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
 
+@app.route("/sell", methods=["POST"])
+def sell_investment():
+    data = request.get_json()
+    ticker = data.get("ticker")
+    shares = data.get("shares")
+    price = data.get("price")
+    if not ticker or shares is None:
+        return jsonify({"error": "Missing ticker or shares"}), 400
+    try:
+        realized = get_portfolio().sell_investment(ticker, float(shares), float(price) if price is not None else None)
+        return jsonify({"message": f"Sold {shares} {ticker}", "realized_pl": realized}), 200
+    except KeyError as ke:
+        return jsonify({"error": str(ke)}), 404
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
 @app.route("/remove", methods=["POST"])
 def remove_investment():
     data = request.get_json()
@@ -50,7 +191,7 @@ def remove_investment():
     if not ticker:
         return jsonify({"error": "Missing ticker"}), 400
     try:
-        portfolio.remove_investment(ticker)
+        get_portfolio().remove_investment(ticker)
         return jsonify({"message": f"Removed {ticker}"}), 200
     except KeyError as ke:
         return jsonify({"error": str(ke)}), 404
@@ -65,12 +206,25 @@ def get_prices():
     tickers = data.get("tickers")
     if not tickers or not isinstance(tickers, list):
         return jsonify({"error": "Missing or invalid tickers list"}), 400
+    if request.args.get("stream") == "1" or "application/x-ndjson" in request.headers.get("Accept", ""):
+        # One line per ticker as it resolves, cached ones first
+        lines = (json.dumps({"ticker": t, "price": p}) + "\n" for t, p in iter_stock_prices(tickers))
+        return Response(lines, mimetype="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
     try:
-        prices = get_multiple_stock_prices(tickers)
-        return jsonify(prices)
+        return cached_response(
+            (request.path, tickers),
+            lambda: quote_versions(tickers),
+            lambda: app.json.response(get_multiple_stock_prices(tickers)).get_data(),
+            "application/json"
+        )
     except StockPriceError as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Counters and histograms of this worker process in the Prometheus text format"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
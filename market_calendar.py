@@ -0,0 +1,211 @@
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, time as clock, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+# Optional extra closures and early closes on top of the built-in rules:
+# {"closed": ["2025-01-09"], "early_close": {"2025-07-03": "13:00"}}
+CALENDAR_PATH = "data/market_calendar.json"
+# Where to download that file from; without it the calendar never touches the network
+CALENDAR_URL = os.environ.get("FINSIGHT_MARKET_CALENDAR_URL")
+# Re-download the file once it is older than this
+CALENDAR_MAX_AGE = 7 * 24 * 3600
+
+# One-off NYSE closures the holiday rules can't predict
+SPECIAL_CLOSURES = {
+    date(2018, 12, 5),  # President George H. W. Bush
+    date(2025, 1, 9),   # President Jimmy Carter
+}
+
+
+def easter(year):
+    """Easter Sunday (Gregorian) for year"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year, month, weekday, n):
+    """n-th (1-based) weekday (Mon=0) of the month; n=-1 for the last one"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day):
+    """Saturday holidays are observed on Friday, Sunday ones on Monday"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=32)
+def nyse_holidays(year):
+    """Full-day NYSE holidays in year, from the exchange's standing rules"""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),   # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),   # Washington's Birthday
+        easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),  # Memorial Day
+        _observed(date(year, 7, 4)),   # Independence Day
+        _nth_weekday(year, 9, 0, 1),   # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed(date(year, 12, 25)),  # Christmas
+    }
+    # New Year's Day on a Saturday is not made up on the Friday before
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(holidays)
+
+
+@lru_cache(maxsize=32)
+def nyse_early_closes(year):
+    """Days the NYSE closes at 1pm: before Independence Day, after Thanksgiving, Christmas Eve"""
+    holidays = nyse_holidays(year)
+    days = {_nth_weekday(year, 11, 3, 4) + timedelta(days=1)}
+    for day in (date(year, 7, 3), date(year, 12, 24)):
+        if day.weekday() < 5 and day not in holidays:
+            days.add(day)
+    return frozenset(days)
+
+
+class MarketCalendar:
+    """
+    Trading sessions of the US equity market, computed locally.
+
+    Weekends, NYSE holidays and 1pm early closes follow the exchange's
+    standing rules; unusual closures can be added through CALENDAR_PATH,
+    which is the only thing ever fetched over the network (and only when
+    CALENDAR_URL is set). status() is memoized per minute, so polling it costs
+    one comparison.
+    """
+
+    def __init__(self, timezone="America/New_York", open_time=clock(9, 30), close_time=clock(16, 0),
+                 early_close_time=clock(13, 0), path=CALENDAR_PATH, url=CALENDAR_URL):
+        self.tz = ZoneInfo(timezone)
+        self.open_time = open_time
+        self.close_time = close_time
+        self.early_close_time = early_close_time
+        self.path = path
+        self.url = url
+        self.extra_closed = set(SPECIAL_CLOSURES)
+        self.extra_early = {}
+        self._memo = (None, None)
+        self._refreshing = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Read the overrides file, if there is one"""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable market calendar {self.path}: {e}")
+            data = {}
+        self.extra_closed = set(SPECIAL_CLOSURES) | {date.fromisoformat(d) for d in data.get('closed', [])}
+        self.extra_early = {
+            date.fromisoformat(d): clock.fromisoformat(t) for d, t in data.get('early_close', {}).items()
+        }
+        self._memo = (None, None)
+
+    def refresh(self):
+        """Download the overrides file from url and reload; returns True if it was replaced"""
+        if not self.url:
+            return False
+        from providers import get_session
+        response = get_session().get(self.url, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, self.path)
+        self.load()
+        return True
+
+    def refresh_if_stale(self):
+        """Refresh in the background when the overrides file is missing or older than CALENDAR_MAX_AGE"""
+        if not self.url:
+            return
+        try:
+            age = time.time() - os.path.getmtime(self.path)
+        except OSError:
+            age = None
+        if age is not None and age < CALENDAR_MAX_AGE:
+            return
+        if not self._refreshing.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Warning: market calendar refresh failed: {e}")
+            finally:
+                self._refreshing.release()
+
+        threading.Thread(target=run, name="finsight-calendar", daemon=True).start()
+
+    def is_trading_day(self, day):
+        return day.weekday() < 5 and day not in nyse_holidays(day.year) and day not in self.extra_closed
+
+    def session(self, day):
+        """(open, close) as aware datetimes for day, or None if the market is closed all day"""
+        if not self.is_trading_day(day):
+            return None
+        close = self.extra_early.get(day)
+        if close is None:
+            close = self.early_close_time if day in nyse_early_closes(day.year) else self.close_time
+        return (datetime.combine(day, self.open_time, self.tz), datetime.combine(day, close, self.tz))
+
+    def is_open(self, when=None):
+        when = datetime.now(self.tz) if when is None else when.astimezone(self.tz)
+        hours = self.session(when.date())
+        return hours is not None and hours[0] <= when < hours[1]
+
+    def next_open(self, when=None):
+        """Start of the next session after when"""
+        when = datetime.now(self.tz) if when is None else when.astimezone(self.tz)
+        day = when.date()
+        for _ in range(15):
+            hours = self.session(day)
+            if hours is not None and hours[0] > when:
+                return hours[0]
+            day += timedelta(days=1)
+        return None
+
+    def status(self, when=None):
+        """"OPEN" or "CLOSED"; without when, the answer for the current minute is reused"""
+        if when is not None:
+            return "OPEN" if self.is_open(when) else "CLOSED"
+        minute = int(time.time() // 60)
+        memo_minute, memo_status = self._memo
+        if memo_minute == minute:
+            return memo_status
+        self.refresh_if_stale()
+        status = "OPEN" if self.is_open() else "CLOSED"
+        self._memo = (minute, status)
+        return status
@@ -1,21 +1,280 @@
 import json
 import os
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import PERSISTENCE_WRITE_LATENCY, PERSISTENCE_WRITE_BYTES
+import tracing
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking is available
+    fcntl = None
 
 # File to persist portfolio data
 DATA_PATH = "data/portfolio.json"
+# Mutations since the last snapshot, one JSON record per line
+JOURNAL_PATH = "data/portfolio.journal"
+# Held with flock while any process reads-modifies-writes the files above
+LOCK_PATH = "data/portfolio.lock"
+# Fold the journal into a fresh snapshot once it holds this many records
+COMPACT_AFTER = 500
+# Group commit: records written within this many seconds share one write and fsync.
+# Callers still return only after their record is on disk; 0 flushes each record on its own.
+FLUSH_WINDOW = float(os.environ.get("FINSIGHT_FLUSH_WINDOW", 0))
+
+_journal_lock = threading.RLock()
+_flushed = threading.Condition(_journal_lock)
+_pending = []
+_pending_seq = 0  # last record queued
+_flushed_seq = 0  # last record known to be on disk (or failed)
+_flush_error = None
+_flush_scheduled = False
+_journal_records = 0
+_compacting = False
+# On-disk version this process last read or wrote, see changed_on_disk()
+_known_version = None
+
+_file_lock_mutex = threading.Lock()
+_file_lock_count = 0
+_file_lock_fd = None
+_file_lock_key = None
+
+@contextmanager
+def locked():
+    """Exclusive access to the portfolio files across threads and worker processes."""
+    with _journal_lock:
+        _acquire_file_lock()
+        try:
+            yield
+        finally:
+            _release_file_lock()
 
 def load_investments():
-    """Load the portfolio data from disk."""
+    """Load the portfolio data from disk: the last snapshot plus every journaled mutation."""
+    global _journal_records, _known_version
+    with locked():
+        _write_pending()
+        with tracing.span("disk_read"):
+            data = _read_snapshot()
+            _journal_records = _replay_journal(data)
+        _known_version = _disk_version()
+    return data
+
+def changed_on_disk():
+    """True if another process has written the portfolio since this one last read or wrote it."""
+    return _disk_version() != _known_version
+
+def save_investments(data):
+    """Save the full portfolio data to disk as a new snapshot and reset the journal."""
+    global _known_version
+    with locked():
+        _write_pending()
+        _write_snapshot(data)
+        _truncate_journal()
+        _known_version = _disk_version()
+
+def save_investment(ticker, record):
+    """Journal the new state of a single position."""
+    _append({'op': 'set', 'ticker': ticker, 'data': record})
+
+def delete_investment(ticker):
+    """Journal the removal of a single position."""
+    _append({'op': 'del', 'ticker': ticker})
+
+def compact_journal():
+    """Rewrite the snapshot with the journal applied, then empty the journal."""
+    global _compacting, _known_version
+    try:
+        with locked():
+            _write_pending()
+            data = _read_snapshot()
+            _replay_journal(data)
+            # A crash between these two steps is harmless: replaying 'set'/'del'
+            # records over a snapshot that already contains them is idempotent
+            _write_snapshot(data)
+            _truncate_journal()
+            _known_version = _disk_version()
+    finally:
+        _compacting = False
+
+def _append(entry):
+    global _pending_seq, _flush_scheduled, _compacting
+    line = json.dumps(entry, separators=(',', ':')) + "\n"
+    with _journal_lock:
+        _pending.append(line)
+        _pending_seq += 1
+        seq = _pending_seq
+
+        if FLUSH_WINDOW <= 0:
+            with locked():
+                _write_pending()
+        else:
+            if not _flush_scheduled:
+                _flush_scheduled = True
+                # Keep other processes out until this batch is on disk, so none of them
+                # can read-modify-write a position from a version missing these records
+                _acquire_file_lock()
+                timer = threading.Timer(FLUSH_WINDOW, _flush_batch)
+                timer.daemon = True
+                timer.start()
+            while _flushed_seq < seq:
+                _flushed.wait()
+
+        if _flush_error is not None and _flush_error[0] < seq <= _flush_error[1]:
+            raise IOError(f"Could not write portfolio journal: {_flush_error[2]}")
+
+        start_compaction = _journal_records >= COMPACT_AFTER and not _compacting
+        if start_compaction:
+            _compacting = True
+
+    if start_compaction:
+        threading.Thread(target=compact_journal, name="finsight-compact", daemon=True).start()
+
+def _flush_batch():
+    global _flush_scheduled
+    try:
+        with locked():
+            try:
+                _write_pending()
+            except (IOError, OSError) as e:
+                print(f"Error: journal flush failed: {e}")
+            finally:
+                _flush_scheduled = False
+    finally:
+        # Drop the hold taken when the batch was opened
+        _release_file_lock()
+
+def _write_pending():
+    """Write every queued record with one write and fsync. Caller holds locked()."""
+    global _flushed_seq, _flush_error, _journal_records, _known_version
+    if not _pending:
+        return
+    lines = "".join(_pending)
+    count = len(_pending)
+    first_seq = _pending_seq - count
+    _pending.clear()
+    try:
+        _ensure_data_dir(JOURNAL_PATH)
+        with tracing.span("disk_write"), PERSISTENCE_WRITE_LATENCY.time("journal"):
+            with open(JOURNAL_PATH, 'a') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+        PERSISTENCE_WRITE_BYTES.inc("journal", amount=len(lines.encode()))
+    except (IOError, OSError) as e:
+        # Waiters whose records were in this batch raise instead of returning
+        _flush_error = (first_seq, _pending_seq, e)
+        raise
+    else:
+        _journal_records += count
+        # Nobody else can have written while we hold the lock, so this is still our version
+        _known_version = _disk_version()
+    finally:
+        _flushed_seq = _pending_seq
+        _flushed.notify_all()
+
+def _acquire_file_lock():
+    global _file_lock_count, _file_lock_fd, _file_lock_key
+    with _file_lock_mutex:
+        if _file_lock_count == 0 and fcntl is not None:
+            # flock belongs to the open file, so a worker forked from a preloaded
+            # master must open its own descriptor instead of sharing the parent's
+            key = (LOCK_PATH, os.getpid())
+            if _file_lock_fd is None or _file_lock_key != key:
+                if _file_lock_fd is not None and _file_lock_key[1] == os.getpid():
+                    os.close(_file_lock_fd)
+                _ensure_data_dir(LOCK_PATH)
+                _file_lock_fd = os.open(LOCK_PATH, os.O_RDWR | os.O_CREAT, 0o644)
+                _file_lock_key = key
+            fcntl.flock(_file_lock_fd, fcntl.LOCK_EX)
+        _file_lock_count += 1
+
+def _release_file_lock():
+    global _file_lock_count
+    with _file_lock_mutex:
+        _file_lock_count -= 1
+        if _file_lock_count == 0 and fcntl is not None and _file_lock_fd is not None:
+            fcntl.flock(_file_lock_fd, fcntl.LOCK_UN)
+
+def _disk_version():
+    """Identity of the snapshot and journal files as they are on disk right now."""
+    version = []
+    for path in (DATA_PATH, JOURNAL_PATH):
+        try:
+            st = os.stat(path)
+            version.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        except OSError:
+            version.append(None)
+    return tuple(version)
+
+def _read_snapshot():
     if not os.path.exists(DATA_PATH):
         return {}
     try:
         with open(DATA_PATH, 'r') as f:
             return json.load(f)
-    except (json.JSONDecodeError, IOError):
+    except (json.JSONDecodeError, IOError) as e:
+        # Keep the damaged file for inspection instead of overwriting it on the next compaction
+        corrupt_path = f"{DATA_PATH}.corrupt-{int(time.time())}"
+        print(f"Error: could not read {DATA_PATH} ({e}); moved it to {corrupt_path}")
+        try:
+            os.replace(DATA_PATH, corrupt_path)
+        except OSError:
+            pass
         return {}
 
-def save_investments(data):
-    """Save the portfolio data to disk."""
-    os.makedirs(os.path.dirname(DATA_PATH), exist_ok=True)
-    with open(DATA_PATH, 'w') as f:
-        json.dump(data, f, indent=4)
+def _replay_journal(data):
+    """Apply journal records to data in place and return how many were applied."""
+    if not os.path.exists(JOURNAL_PATH):
+        return 0
+    with open(JOURNAL_PATH, 'rb') as f:
+        raw = f.read()
+
+    *lines, tail = raw.split(b"\n")
+    if tail:
+        # Torn final write from a crash: drop it so the next append starts on a clean line
+        print(f"Warning: discarding incomplete last record in {JOURNAL_PATH}")
+        with open(JOURNAL_PATH, 'r+b') as f:
+            f.truncate(len(raw) - len(tail))
+
+    applied = 0
+    for i, line in enumerate(lines):
+        try:
+            entry = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            print(f"Warning: skipping unreadable journal record {i + 1} in {JOURNAL_PATH}")
+            continue
+        if entry.get('op') == 'set':
+            data[entry['ticker']] = entry['data']
+        elif entry.get('op') == 'del':
+            data.pop(entry['ticker'], None)
+        applied += 1
+    return applied
+
+def _write_snapshot(data):
+    """Write the snapshot to a temp file and atomically swap it into place."""
+    _ensure_data_dir(DATA_PATH)
+    tmp_path = f"{DATA_PATH}.{os.getpid()}.tmp"
+    with tracing.span("disk_write"), PERSISTENCE_WRITE_LATENCY.time("snapshot"):
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        os.replace(tmp_path, DATA_PATH)
+    PERSISTENCE_WRITE_BYTES.inc("snapshot", amount=size)
+
+def _truncate_journal():
+    global _journal_records
+    if os.path.exists(JOURNAL_PATH):
+        with open(JOURNAL_PATH, 'w') as f:
+            f.flush()
+            os.fsync(f.fileno())
+    _journal_records = 0
+
+def _ensure_data_dir(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
@@ -1,70 +1,204 @@
-from utils import get_stock_price, get_stock_info, validate_ticker, StockPriceError
-from persistence import load_investments, save_investments
+import threading
+import weakref
+from collections import OrderedDict
+
+from utils import (
+    get_stock_price, get_stock_info, get_cached_stock_info, get_multiple_stock_prices, validate_ticker,
+    fetch_concurrently, StockPriceError
+)
+from storage import get_default_storage
+from analytics import PortfolioAnalytics
+import lots
+import tracing
+
+
+# Unpriced PortfolioAnalytics per storage and user, reused until the storage version changes
+_positions_cache = weakref.WeakKeyDictionary()
+_positions_cache_lock = threading.Lock()
+POSITIONS_CACHE_USERS = 256
+
+
+class PortfolioSnapshot:
+    """Point-in-time view of the portfolio built from a single quote per ticker."""
+
+    def __init__(self, investments, quotes, positions=None):
+        # quotes: ticker -> get_stock_info() dict, or a StockPriceError for failed lookups.
+        # positions: an unpriced PortfolioAnalytics of these investments to price instead of rebuilding
+        investments = dict(investments)
+        self.quotes = quotes
+        priced = {t: q for t, q in quotes.items() if q is not None and not isinstance(q, Exception)}
+        if positions is None:
+            positions = PortfolioAnalytics.from_investments(investments)
+        self.analytics = positions.with_quotes(priced)
+
+        totals = self.analytics.totals()
+        self.total_invested = totals['total_invested']
+        self.current_value = totals['current_value']
+        self.profit_loss = totals['profit_loss']
+        self.unrealized_pl = totals['unrealized_pl']
+        self.realized_pl = totals['realized_pl']
+        self.day_change = totals['day_change']
+        self.day_change_percent = totals['day_change_percent']
+
+        rows = self.analytics.rows()
+        index = self.analytics.index
+        self.summary = {}
+        for ticker, data in investments.items():
+            amount_invested = data['amount_invested']
+            stock_info = priced.get(ticker)
+            if stock_info is None:
+                error = quotes.get(ticker)
+                self.summary[ticker] = {
+                    'error': str(error) if error else f"No quote for {ticker}",
+                    'amount_invested': amount_invested,
+                    'shares': lots.position_shares(data)
+                }
+                continue
+
+            i = index[ticker]
+            self.summary[ticker] = {
+                'name': stock_info.get('name', ticker),
+                'current_price': stock_info.get('price'),
+                'currency': stock_info.get('currency', 'USD'),
+                'change': stock_info.get('change', 0),
+                'change_percent': stock_info.get('change_percent', 0),
+                'amount_invested': amount_invested,
+                'shares': rows['shares'][i],
+                'market_value': rows['market_value'][i],
+                'weight': rows['weight'][i],
+                'return_percent': rows['return_percent'][i],
+                'profit_loss_per_stock': rows['profit_loss'][i],
+                'realized_pl': rows['realized_pl'][i],
+                'stale': stock_info.get('stale', False)
+            }
 
 
 class Portfolio:
-    def __init__(self):
-        # investments dict: key = ticker, value = dict with amount invested and optionally other data
-        self.investments = load_investments()
+    def __init__(self, user=None, storage=None):
+        # user selects whose positions to load; the JSON backend has a single shared portfolio
+        self.user = user
+        self.storage = storage or get_default_storage()
+        # investments dict: key = ticker, value = dict with the cost basis of the shares held
+        # ('amount_invested'), their purchase lots packed by lots.py and any realized P/L
+        with tracing.span("load"):
+            # Read before loading: a write in between only costs one extra rebuild later
+            self.version = self.storage.version(user)
+            self._investments = self.storage.load(user)
+
+    @property
+    def investments(self):
+        return self._investments
 
-    def add_investment(self, ticker, amount_invested):
+    @investments.setter
+    def investments(self, investments):
+        # Replaced from outside, so no longer what the storage version describes
+        self._investments = investments
+        self.version = None
+
+    def add_investment(self, ticker, amount_invested, shares=None):
+        """Buy shares of ticker for amount_invested; without shares, as many as the amount buys now"""
         ticker = ticker.upper().strip()
         if not validate_ticker(ticker):
             raise ValueError(f"Invalid ticker symbol: {ticker}")
-        
-        if ticker in self.investments:
-            self.investments[ticker]['amount_invested'] += amount_invested
-        else:
-            self.investments[ticker] = {'amount_invested': amount_invested}
-        save_investments(self.investments)
+        if shares is None:
+            shares = amount_invested / self._current_price(ticker)
+
+        def apply(record):
+            return lots.buy(record, shares, amount_invested)
+
+        # Read-modify-write happens inside the backend so concurrent workers don't lose updates
+        self.investments[ticker] = self.storage.update(self.user, ticker, apply)
+        self.version = None
+
+    def sell_investment(self, ticker, shares, price=None):
+        """Sell shares of ticker (oldest lots first) at price, or the current price; returns the realized P/L"""
+        ticker = ticker.upper().strip()
+        if ticker not in self.investments:
+            raise KeyError(f"{ticker} not found in portfolio")
+        if price is None:
+            price = self._current_price(ticker)
+        realized = []
+
+        def apply(record):
+            if record is None:
+                raise KeyError(f"{ticker} not found in portfolio")
+            record, gain = lots.sell(record, shares, shares * price)
+            realized.append(gain)
+            return record
+
+        # A fully sold position is kept so its realized P/L still counts
+        self.investments[ticker] = self.storage.update(self.user, ticker, apply)
+        self.version = None
+        return realized[0]
 
     def remove_investment(self, ticker):
         ticker = ticker.upper().strip()
-        if ticker in self.investments:
-            del self.investments[ticker]
-        else:
+        if not self.storage.delete(self.user, ticker):
             raise KeyError(f"{ticker} not found in portfolio")
-        save_investments(self.investments)
+        self.investments.pop(ticker, None)
+        self.version = None
+
+    def _current_price(self, ticker):
+        try:
+            price = get_stock_price(ticker)
+        except StockPriceError as e:
+            raise ValueError(f"Could not get a price for {ticker}: {e}")
+        if not price:
+            raise ValueError(f"Could not get a price for {ticker}")
+        return price
+
+    def positions(self):
+        """
+        Unpriced PortfolioAnalytics of self.investments.
+
+        Building it costs milliseconds for a large account, so it is kept per
+        storage and user and rebuilt only when the storage's version changes;
+        quotes are then applied to a copy with with_quotes().
+        """
+        if self.version is None:
+            return PortfolioAnalytics.from_investments(self.investments)
+        with _positions_cache_lock:
+            by_user = _positions_cache.setdefault(self.storage, OrderedDict())
+            cached = by_user.get(self.user)
+            if cached is not None and cached[0] == self.version:
+                by_user.move_to_end(self.user)
+                return cached[1]
+        positions = PortfolioAnalytics.from_investments(self.investments)
+        with _positions_cache_lock:
+            by_user[self.user] = (self.version, positions)
+            by_user.move_to_end(self.user)
+            if len(by_user) > POSITIONS_CACHE_USERS:
+                by_user.popitem(last=False)
+        return positions
+
     def calculate_total_invested(self):
-        return sum(data['amount_invested'] for data in self.investments.values())
+        return self.positions().total_invested
 
     def calculate_current_value(self):
-        total_value = 0
-        for ticker in self.investments:
-            try:
-                price = get_stock_price(ticker)
-                self.investments[ticker]['current_price'] = price
-                # Assume 1 unit for simplicity, or you can extend for quantity if needed
-                total_value += price
-            except StockPriceError:
-                self.investments[ticker]['current_price'] = None
-        return total_value
+        prices = get_multiple_stock_prices(list(self.investments))
+        return self.positions().with_quotes({t: {'price': p} for t, p in prices.items()}).total_value
 
     def calculate_profit_loss(self):
         current_value = self.calculate_current_value()
         invested = self.calculate_total_invested()
         return current_value - invested
 
+    def get_snapshot(self):
+        """Fetch each held ticker's quote once and derive every dashboard figure from it."""
+        quotes = {}
+        with tracing.span("quotes"):
+            results = fetch_concurrently(get_stock_info, list(self.investments), fallback=get_cached_stock_info)
+        for ticker, result in results.items():
+            if result.value is not None:
+                # OK, or STALE when the provider missed its deadline
+                quotes[ticker] = result.value
+            else:
+                quotes[ticker] = StockPriceError(result.error)
+        with tracing.span("valuation"):
+            return PortfolioSnapshot(self.investments, quotes, self.positions())
+
     def get_portfolio_summary(self):
-        summary = {}
-        for ticker, data in self.investments.items():
-            try:
-                stock_info = get_stock_info(ticker)
-                summary[ticker] = {
-                    'name': stock_info.get('name', ticker),
-                    'current_price': stock_info.get('price'),
-                    'currency': stock_info.get('currency', 'USD'),
-                    'change': stock_info.get('change', 0),
-                    'change_percent': stock_info.get('change_percent', 0),
-                    'amount_invested': data['amount_invested'],
-                    'profit_loss_per_stock': (stock_info.get('price') or 0) - data['amount_invested']
-                }
-            except StockPriceError as e:
-                summary[ticker] = {
-                    'error': str(e),
-                    'amount_invested': data['amount_invested']
-                }
-        return summary
+        return self.get_snapshot().summary
 
 
 if __name__ == "__main__":
@@ -0,0 +1,582 @@
+import os
+import random
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
+
+from history_store import bars_from_frame
+from lazy import LazyModule
+from metrics import PROVIDER_CALLS, PROVIDER_LATENCY
+
+# Providers to ask for quotes, in priority order, as "name[:latency budget in seconds]"
+QUOTE_PROVIDERS = os.environ.get("FINSIGHT_QUOTE_PROVIDERS", "yfinance,alphavantage")
+# Seconds a provider may take before the next one in the chain is tried
+DEFAULT_LATENCY_BUDGET = float(os.environ.get("FINSIGHT_PROVIDER_BUDGET", 5))
+ALPHA_VANTAGE_API_KEY = os.environ.get("ALPHA_VANTAGE_API_KEY")
+# Keep-alive connections kept open per host by the shared HTTP session
+HTTP_POOL_SIZE = int(os.environ.get("FINSIGHT_HTTP_POOL_SIZE", 16))
+
+# Circuit breaker: open once this share of a provider's recent calls failed or ran over budget
+BREAKER_ERROR_RATE = float(os.environ.get("FINSIGHT_BREAKER_ERROR_RATE", 0.5))
+BREAKER_WINDOW = 20  # recent calls considered
+BREAKER_MIN_CALLS = 5  # don't judge a provider on fewer calls than this
+# Seconds an open breaker waits before letting a probe call through
+BREAKER_RECOVERY_TIME = float(os.environ.get("FINSIGHT_BREAKER_RECOVERY", 30))
+# Hedged requests: race the next provider once a call has run past the provider's p95
+HEDGE_REQUESTS = os.environ.get("FINSIGHT_HEDGE_REQUESTS", "0") == "1"
+HEDGE_MIN_SAMPLES = 20  # latencies needed before the p95 is trusted
+
+# Imported on first use: yfinance (with pandas) alone takes most of a worker's startup
+yf = LazyModule("yfinance")
+requests = LazyModule("requests")
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+_call_executor = None
+_call_executor_lock = threading.Lock()
+
+
+class ProviderError(Exception):
+    pass
+
+
+def get_session():
+    """Process-wide requests.Session with a keep-alive connection pool"""
+    global _session, _session_pid
+    with _session_lock:
+        # Sockets must not be shared with a parent process after fork
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+            _session_pid = os.getpid()
+        return _session
+
+
+class QuoteProvider:
+    """
+    One source of quotes.
+
+    fetch_quote returns a record {'price', 'prev_close', 'name', 'currency',
+    'fetched_at'} whose price is None when the provider doesn't know the
+    symbol, and raises when the provider itself fails.
+    """
+
+    name = "provider"
+
+    def __init__(self, latency_budget=None):
+        self.latency_budget = DEFAULT_LATENCY_BUDGET if latency_budget is None else latency_budget
+
+    def fetch_quote(self, ticker):
+        raise NotImplementedError
+
+    def fetch_quotes(self, tickers):
+        """{ticker: record} for the tickers this provider could price; providers override to batch"""
+        quotes = {}
+        for ticker in tickers:
+            record = self.fetch_quote(ticker)
+            if record and record.get('price'):
+                quotes[ticker] = record
+        return quotes
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name} budget={self.latency_budget}s>"
+
+
+class YFinanceProvider(QuoteProvider):
+    """
+    Quotes from Yahoo Finance through yfinance.
+
+    yfinance keeps its own shared (curl_cffi) session, so no pooled
+    requests.Session is passed in here.
+    """
+
+    name = "yfinance"
+
+    def __init__(self, latency_budget=None, history_store=None):
+        super().__init__(latency_budget)
+        # Local daily bars: fills in a missing price or previous close, and keeps
+        # the bars that come with each batch download
+        self.history_store = history_store
+
+    def fetch_quote(self, ticker):
+        try:
+            info = yf.Ticker(ticker).info
+        except Exception as e:
+            if not _is_unknown_symbol(e):
+                raise
+            # Yahoo answered, it just doesn't list the symbol: a "not found", not a provider failure
+            return {'price': None, 'prev_close': None, 'name': ticker, 'currency': 'USD', 'fetched_at': time.time()}
+
+        price = info.get('regularMarketPrice') or info.get('currentPrice')
+        prev_close = info.get('regularMarketPreviousClose')
+
+        # Fallback: read what's missing from the local daily bars
+        if (not price or not prev_close) and self.history_store is not None:
+            closes = self.history_store.update(ticker)['close']
+            if not price and len(closes):
+                price = closes[-1]
+            if not prev_close and len(closes) >= 2:
+                prev_close = closes[-2]
+
+        return {
+            'price': float(price) if price else None,
+            'prev_close': float(prev_close) if prev_close else None,
+            'name': info.get('longName', ticker),
+            'currency': info.get('currency', 'USD'),
+            'fetched_at': time.time()
+        }
+
+    def fetch_quotes(self, tickers):
+        """Latest and previous closes for many tickers with a single yf.download call"""
+        if not tickers:
+            return {}
+
+        data = yf.download(
+            tickers,
+            period="5d",
+            group_by="ticker",
+            auto_adjust=False,
+            progress=False,
+            threads=True
+        )
+        if data is None or data.empty:
+            return {}
+
+        multi_level = getattr(data.columns, 'nlevels', 1) > 1
+        fetched_at = time.time()
+        quotes = {}
+        for ticker in tickers:
+            try:
+                if multi_level:
+                    frame = data[ticker]
+                elif len(tickers) == 1:
+                    frame = data
+                else:
+                    continue
+                # The download already carries the daily bars, keep them for later
+                if self.history_store is not None:
+                    try:
+                        self.history_store.append(ticker, bars_from_frame(frame))
+                    except Exception as e:
+                        print(f"Warning: could not store history for {ticker}: {e}")
+                closes = frame['Close'].dropna()
+                if not closes.empty:
+                    quotes[ticker] = {
+                        'price': float(closes.iloc[-1]),
+                        'prev_close': float(closes.iloc[-2]) if len(closes) >= 2 else None,
+                        'fetched_at': fetched_at
+                    }
+            except (KeyError, IndexError, TypeError, ValueError):
+                continue
+
+        return quotes
+
+
+def _is_unknown_symbol(error):
+    """True for the errors yfinance raises when Yahoo has no such symbol, as opposed to being unreachable"""
+    missing = getattr(getattr(yf, "exceptions", None), "YFTickerMissingError", None)
+    if missing is not None and isinstance(error, missing):
+        return True
+    return getattr(getattr(error, "response", None), "status_code", None) == 404
+
+
+class AlphaVantageProvider(QuoteProvider):
+    """Quotes from the Alpha Vantage GLOBAL_QUOTE endpoint over the shared HTTP session"""
+
+    name = "alphavantage"
+    URL = "https://www.alphavantage.co/query"
+
+    def __init__(self, api_key, latency_budget=None, session=None):
+        super().__init__(latency_budget)
+        self.api_key = api_key
+        self.session = session
+
+    def fetch_quote(self, ticker):
+        session = self.session or get_session()
+        params = {
+            'function': 'GLOBAL_QUOTE',
+            'symbol': ticker,
+            'apikey': self.api_key
+        }
+        response = session.get(self.URL, params=params, timeout=self.latency_budget)
+        response.raise_for_status()
+        data = response.json()
+
+        if 'Global Quote' not in data:
+            # Rate limiting and bad keys come back as 200 with a 'Note' or 'Information'
+            raise ProviderError(data.get('Note') or data.get('Information') or data.get('Error Message')
+                                or "Unexpected Alpha Vantage response")
+
+        quote = data['Global Quote']
+        price = quote.get('05. price')
+        prev_close = quote.get('08. previous close')
+        return {
+            'price': float(price) if price else None,
+            'prev_close': float(prev_close) if prev_close else None,
+            'name': ticker,
+            'currency': 'USD',
+            'fetched_at': time.time()
+        }
+
+
+class StubProvider(QuoteProvider):
+    """
+    Deterministic offline quotes for tests, benchmarks and local development.
+
+    Prices come from prices when given, otherwise from a hash of the symbol,
+    so the same ticker always gets the same quote. Symbols in invalid are
+    unknown. Every request sleeps latency seconds, and failure_rate of them
+    raise ProviderError, drawn from a generator seeded with seed so runs
+    repeat exactly. calls counts lookups per ticker.
+    """
+
+    name = "stub"
+
+    def __init__(self, prices=None, invalid=(), latency=0.0, failure_rate=0.0, seed=0, latency_budget=None):
+        super().__init__(latency_budget)
+        self.prices = dict(prices or {})
+        self.invalid = set(invalid)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = Counter()
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def price_for(self, ticker):
+        if ticker in self.invalid:
+            return None
+        if ticker in self.prices:
+            return self.prices[ticker]
+        return 10 + zlib.crc32(ticker.encode()) % 49000 / 100
+
+    def fetch_quote(self, ticker):
+        self.calls[ticker] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self._fails():
+            raise ProviderError(f"Simulated failure for {ticker}")
+        return self._record(ticker)
+
+    def fetch_quotes(self, tickers):
+        """One simulated bulk request: a single latency, failures dropping single tickers"""
+        if self.latency:
+            time.sleep(self.latency)
+        quotes = {}
+        for ticker in tickers:
+            self.calls[ticker] += 1
+            if self._fails():
+                continue
+            record = self._record(ticker)
+            if record['price']:
+                quotes[ticker] = record
+        return quotes
+
+    def _fails(self):
+        if not self.failure_rate:
+            return False
+        with self._random_lock:
+            return self._random.random() < self.failure_rate
+
+    def _record(self, ticker):
+        price = self.price_for(ticker)
+        return {
+            'price': price,
+            # A steady 1% daily gain keeps change figures predictable
+            'prev_close': round(price / 1.01, 4) if price else None,
+            'name': f"{ticker} (stub)",
+            'currency': 'USD',
+            'fetched_at': time.time()
+        }
+
+
+class CircuitBreaker:
+    """
+    Stops calling a provider that keeps failing or timing out.
+
+    Closed: calls go through and the last window outcomes are kept. Once at
+    least min_calls are recorded and error_rate of them failed (errors and
+    calls over the latency budget both count), the breaker opens and allow()
+    refuses calls. After recovery_time one probe call is let through
+    (half-open); its success closes the breaker, its failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS,
+                 error_rate=BREAKER_ERROR_RATE, recovery_time=BREAKER_RECOVERY_TIME):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.recovery_time = recovery_time
+        self.state = self.CLOSED
+        self.trips = 0
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probe_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may go to the provider now; a True in half-open state is the probe"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self._opened_at >= self.recovery_time:
+                self.state = self.HALF_OPEN
+                self._probe_at = now
+                return True
+            if self.state == self.HALF_OPEN and now - self._probe_at >= self.recovery_time:
+                # The last probe never reported back; try another
+                self._probe_at = now
+                return True
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                if ok:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+            self._outcomes.append(ok)
+            if self.state == self.CLOSED and len(self._outcomes) >= self.min_calls:
+                failures = self._outcomes.count(False)
+                if failures / len(self._outcomes) >= self.error_rate:
+                    self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self.trips += 1
+
+
+class LatencyWindow:
+    """Latencies of a provider's recent successful single-quote calls"""
+
+    def __init__(self, size=100):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q):
+        """The q-quantile (0..1) of recent latencies, or None until HEDGE_MIN_SAMPLES are in"""
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[int(q * (len(ordered) - 1))]
+
+
+class ProviderChain:
+    """
+    Providers tried in priority order.
+
+    A provider that raises, doesn't know the symbol, or runs past its latency
+    budget hands over to the next one. The last provider has nothing to fail
+    over to and is waited on; callers bound it with their own deadlines.
+
+    Each provider has a CircuitBreaker; while it is open the provider is
+    skipped without waiting. With hedge=True a single-quote call still
+    running after the provider's p95 latency is raced against the next
+    provider, and whichever prices the symbol first wins.
+    """
+
+    def __init__(self, providers, hedge=HEDGE_REQUESTS):
+        if not providers:
+            raise ValueError("At least one quote provider is required")
+        self.providers = list(providers)
+        self.breakers = [CircuitBreaker() for _ in self.providers]
+        self.latencies = [LatencyWindow() for _ in self.providers]
+        self.hedge = hedge
+
+    def fetch_quote(self, ticker):
+        """Record from the first provider with a price; the 'not found' record if none has
+        one; None if every provider failed or is switched off by its breaker"""
+        not_found = None
+        i = 0
+        while i < len(self.providers):
+            if not self.breakers[i].allow():
+                i += 1
+                continue
+            record, i = self._fetch_one(i, ticker)
+            if record is not None:
+                if record.get('price'):
+                    return record
+                not_found = not_found or record
+            i += 1
+        return not_found
+
+    def fetch_quotes(self, tickers):
+        """{ticker: record} for every ticker some provider could price, batching per provider"""
+        quotes = {}
+        missing = list(tickers)
+        for i, provider in enumerate(self.providers):
+            if not missing:
+                break
+            if not self.breakers[i].allow():
+                continue
+            started = time.monotonic()
+            future = _get_call_executor().submit(provider.fetch_quotes, missing)
+            fetched = self._result(i, future, started, self._budget(i), f"{len(missing)} tickers",
+                                   sample=False) or {}
+            for ticker, record in fetched.items():
+                if record.get('price'):
+                    record['source'] = provider.name
+                    quotes[ticker] = record
+            missing = [t for t in missing if t not in quotes]
+        return quotes
+
+    def status(self):
+        """Breaker state and recent p95 latency per provider"""
+        return [
+            {
+                'provider': provider.name,
+                'state': breaker.state,
+                'trips': breaker.trips,
+                'p95': latencies.percentile(0.95)
+            }
+            for provider, breaker, latencies in zip(self.providers, self.breakers, self.latencies)
+        ]
+
+    def _fetch_one(self, i, ticker):
+        """Ask provider i (and maybe a hedge) for ticker; returns (record, last provider index used)"""
+        started = time.monotonic()
+        future = _get_call_executor().submit(self.providers[i].fetch_quote, ticker)
+
+        hedge_after = self._hedge_delay(i)
+        if hedge_after is not None:
+            done, _ = wait([future], timeout=hedge_after)
+            if not done:
+                backup = self._next_allowed(i)
+                if backup is not None:
+                    return self._race(ticker, (i, future, started), backup)
+
+        remaining = self._budget(i)
+        if remaining is not None:
+            remaining = max(0.0, remaining - (time.monotonic() - started))
+        return self._result(i, future, started, remaining, ticker), i
+
+    def _race(self, ticker, primary, backup):
+        """First priced record from the running primary call or a hedged call to provider backup"""
+        i, primary_future, primary_started = primary
+        backup_started = time.monotonic()
+        calls = {
+            primary_future: (i, primary_started),
+            _get_call_executor().submit(self.providers[backup].fetch_quote, ticker): (backup, backup_started),
+        }
+        deadline = max(primary_started + self.providers[i].latency_budget,
+                       backup_started + self.providers[backup].latency_budget)
+
+        not_found = None
+        pending = set(calls)
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                k, started = calls[future]
+                record = self._result(k, future, started, 0, ticker)
+                if record is None:
+                    continue
+                if record.get('price'):
+                    return record, backup
+                not_found = not_found or record
+        for future in pending:
+            k, _ = calls[future]
+            print(f"Warning: {self.providers[k].name} took longer than "
+                  f"{self.providers[k].latency_budget}s for {ticker}")
+            self.breakers[k].record(False)
+            PROVIDER_CALLS.inc(self.providers[k].name, "quote", "timeout")
+        return not_found, backup
+
+    def _result(self, i, future, started, timeout, what, sample=True):
+        """Result of a call to provider i with its outcome recorded; None on error or timeout"""
+        provider = self.providers[i]
+        kind = "quote" if sample else "batch"
+        try:
+            result = future.result(timeout=timeout)
+        except FutureTimeout:
+            print(f"Warning: {provider.name} took longer than {provider.latency_budget}s for {what}, failing over")
+            self.breakers[i].record(False)
+            PROVIDER_CALLS.inc(provider.name, kind, "timeout")
+            return None
+        except Exception as e:
+            print(f"{provider.name} error for {what}: {e}")
+            self.breakers[i].record(False)
+            PROVIDER_CALLS.inc(provider.name, kind, "error")
+            return None
+
+        elapsed = time.monotonic() - started
+        PROVIDER_CALLS.inc(provider.name, kind, "ok")
+        PROVIDER_LATENCY.observe(elapsed, provider.name, kind)
+        # A slow answer from the last provider still counts against it
+        self.breakers[i].record(elapsed <= provider.latency_budget)
+        if sample:
+            self.latencies[i].add(elapsed)
+        if sample and result is not None:
+            result['source'] = provider.name
+        return result
+
+    def _budget(self, i):
+        """Seconds to wait for provider i before failing over; None for the last provider"""
+        return None if i == len(self.providers) - 1 else self.providers[i].latency_budget
+
+    def _hedge_delay(self, i):
+        if not self.hedge or i == len(self.providers) - 1:
+            return None
+        p95 = self.latencies[i].percentile(0.95)
+        if p95 is None or p95 >= self.providers[i].latency_budget:
+            return None
+        return p95
+
+    def _next_allowed(self, i):
+        for j in range(i + 1, len(self.providers)):
+            if self.breakers[j].allow():
+                return j
+        return None
+
+
+def _get_call_executor():
+    global _call_executor
+    with _call_executor_lock:
+        if _call_executor is None:
+            # Calls abandoned after their latency budget keep a thread until they return
+            _call_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="finsight-provider")
+        return _call_executor
+
+
+def build_providers(spec=QUOTE_PROVIDERS, history_store=None):
+    """ProviderChain from a "name[:budget],..." spec, e.g. "yfinance:3,alphavantage:5" """
+    providers = []
+    for item in spec.split(","):
+        name, _, budget = item.strip().partition(":")
+        name = name.strip().lower()
+        if not name:
+            continue
+        budget = float(budget) if budget else None
+        if name == "yfinance":
+            providers.append(YFinanceProvider(budget, history_store=history_store))
+        elif name == "alphavantage":
+            if not ALPHA_VANTAGE_API_KEY:
+                # Listed by default; silently unused until a key is configured
+                continue
+            providers.append(AlphaVantageProvider(ALPHA_VANTAGE_API_KEY, budget))
+        elif name == "stub":
+            providers.append(StubProvider(latency_budget=budget))
+        else:
+            raise ValueError(f"Unknown quote provider: {name}")
+    return ProviderChain(providers)
@@ -0,0 +1,255 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from connections import SQLiteConnections
+
+
+class _Entry:
+    __slots__ = ("record", "stored_at", "expires_at", "last_good")
+
+    def __init__(self, record, stored_at, expires_at, last_good=None):
+        self.record = record
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+        # Previous good record kept behind a negative entry for stale reads
+        self.last_good = last_good
+
+
+class QuoteCache:
+    """
+    Thread-safe quote cache with TTL expiry and LRU eviction.
+
+    Records are plain dicts (price, prev_close, name, currency, ...). Failed
+    lookups are cached as {'error': message} for negative_ttl seconds so a bad
+    symbol does not hit the provider on every request.
+
+    An optional DiskQuoteCache can sit behind the in-memory entries: good
+    records are written through to it, and in-memory misses are filled from it
+    while the record's fetched_at is still within the TTL.
+    """
+
+    def __init__(self, max_entries=2048, ttl=300, negative_ttl=60, max_stale=3600, backing=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # How long an expired record is kept around for stale reads
+        self.max_stale = max_stale
+        self.backing = backing
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, ticker, count=True):
+        """Return the fresh record for ticker (possibly an error record) or None.
+        count=False leaves the hit/miss counters alone, for re-checks of the same lookup."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(ticker)
+                self.hits += count
+                return entry.record
+            if entry is not None and now - entry.expires_at > self.max_stale:
+                del self._entries[ticker]
+                self.expirations += 1
+                entry = None
+
+        # Another worker, or this process before a restart, may have fetched it
+        record = self._load_from_backing(ticker, entry)
+        with self._lock:
+            if record is not None and now - record['fetched_at'] < self.ttl:
+                self.disk_hits += count
+                return record
+            # Expired entries stay for max_stale seconds so stale reads can still use them
+            self.misses += count
+            return None
+
+    def peek(self, ticker):
+        """Return the last good record for ticker even if expired, without touching counters"""
+        with self._lock:
+            entry = self._entries.get(ticker)
+        if entry is None:
+            return self._load_from_backing(ticker, None)
+        return entry.last_good if 'error' in entry.record else entry.record
+
+    def failed_at(self, ticker):
+        """When the unexpired negative entry for ticker was stored, or None if it has none"""
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is None or 'error' not in entry.record or entry.expires_at <= time.time():
+                return None
+            return entry.stored_at
+
+    def age(self, ticker):
+        """Seconds since ticker was stored, or None if it is not cached"""
+        with self._lock:
+            entry = self._entries.get(ticker)
+            return None if entry is None else time.time() - entry.stored_at
+
+    def set(self, ticker, record, ttl=None):
+        """Store a full quote record for ticker"""
+        self._store(ticker, record, ttl)
+        if self.backing is not None:
+            self.backing.set_many({ticker: record})
+
+    def update(self, ticker, **fields):
+        """Merge fields into the existing good record for ticker and refresh its TTL"""
+        return self.update_many({ticker: fields})[ticker]
+
+    def update_many(self, quotes):
+        """update() for many tickers, written to the backing store in one transaction"""
+        merged = {}
+        for ticker, fields in quotes.items():
+            record = dict(self.peek(ticker) or {})
+            record.update(fields)
+            self._store(ticker, record)
+            merged[ticker] = record
+        if self.backing is not None and merged:
+            self.backing.set_many(merged)
+        return merged
+
+    def set_error(self, ticker, message):
+        """Negative-cache a failed lookup; the last good record remains available to peek()"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(ticker)
+            last_good = None
+            if entry is not None:
+                last_good = entry.last_good if 'error' in entry.record else entry.record
+            self._entries[ticker] = _Entry({'error': message}, now, now + self.negative_ttl, last_good)
+            self._entries.move_to_end(ticker)
+            self._evict()
+
+    def invalidate(self, ticker):
+        with self._lock:
+            self._entries.pop(ticker, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.backing is not None:
+            self.backing.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'disk_hits': self.disk_hits,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, ticker):
+        with self._lock:
+            return ticker in self._entries
+
+    def _store(self, ticker, record, ttl=None, stored_at=None):
+        now = time.time()
+        stored_at = now if stored_at is None else stored_at
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._entries[ticker] = _Entry(record, stored_at, stored_at + ttl)
+            self._entries.move_to_end(ticker)
+            self._evict()
+
+    def _load_from_backing(self, ticker, entry):
+        """Pull a newer good record for ticker from the backing store into memory"""
+        if self.backing is None:
+            return None
+        record = self.backing.get(ticker)
+        if record is None or not record.get('fetched_at'):
+            return None
+        if entry is not None and entry.stored_at >= record['fetched_at']:
+            return None
+        # Keep the original fetch time so the TTL isn't extended by the copy
+        self._store(ticker, record, stored_at=record['fetched_at'])
+        return record
+
+    def _evict(self):
+        """Drop expired entries first, then least recently used ones. Caller holds the lock."""
+        if len(self._entries) <= self.max_entries:
+            return
+        now = time.time()
+        for ticker in [t for t, e in self._entries.items() if e.expires_at + self.max_stale <= now]:
+            del self._entries[ticker]
+            self.expirations += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+class DiskQuoteCache:
+    """
+    Quote records shared through an SQLite file on local disk.
+
+    Every worker on the host, and the next process after a restart, can read
+    what any of them fetched. Only good records are stored; freshness is
+    judged by the caller from each record's fetched_at.
+    """
+
+    def __init__(self, path, busy_timeout=1.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        # A lost quote after a power cut is simply re-fetched
+        self._connections = SQLiteConnections(path, busy_timeout, synchronous="OFF")
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS quotes ("
+            "ticker TEXT PRIMARY KEY, record TEXT NOT NULL, fetched_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+
+    def _connection(self):
+        return self._connections.get()
+
+    def get(self, ticker):
+        try:
+            row = self._connection().execute(
+                "SELECT record FROM quotes WHERE ticker = ?", (ticker,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Warning: quote disk cache read failed: {e}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def set_many(self, records):
+        rows = [
+            (ticker, json.dumps(record), record['fetched_at'])
+            for ticker, record in records.items()
+            if record.get('fetched_at') and 'error' not in record
+        ]
+        if not rows:
+            return
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN")
+            # Never replace a newer quote written by another worker
+            conn.executemany(
+                "INSERT INTO quotes (ticker, record, fetched_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (ticker) DO UPDATE SET record = excluded.record, "
+                "fetched_at = excluded.fetched_at WHERE excluded.fetched_at > quotes.fetched_at",
+                rows
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            print(f"Warning: quote disk cache write failed: {e}")
+            try:
+                self._connection().execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+
+    def clear(self):
+        self._connection().execute("DELETE FROM quotes")
@@ -0,0 +1,65 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Seconds a rendered response is reused for an unchanged portfolio and unchanged quotes
+RESPONSE_CACHE_TTL = float(os.environ.get("FINSIGHT_RESPONSE_CACHE_TTL", 5))
+RESPONSE_CACHE_SIZE = int(os.environ.get("FINSIGHT_RESPONSE_CACHE_SIZE", 256))
+
+
+def make_etag(*parts):
+    """Stable hash of JSON-serializable parts, used as an entity tag"""
+    data = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    """
+    Rendered response bodies keyed by ETag, dropped after ttl seconds or when
+    the least recently used entry makes room for a new one.
+
+    The ETag already names everything the body was built from, so entries
+    never need invalidating; the TTL only bounds memory held for keys that
+    won't come back.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, etag):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(etag)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[etag]
+            self.misses += 1
+            return None
+
+    def set(self, etag, body):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[etag] = (body, time.monotonic() + self.ttl)
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
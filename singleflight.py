@@ -0,0 +1,99 @@
+import threading
+import time
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait and get the same result (or exception). Once it
+    returns, the next call for the key runs again, so this deduplicates
+    in-flight work only and never serves old results. Waiters give up with
+    TimeoutError after timeout seconds if one is given; the leader carries on.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, func, *args, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"Timed out after {timeout:g}s waiting for the in-flight call for {key!r}")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def do_many(self, keys, func, timeout=None):
+        """
+        do() for several keys at once, for work that is cheaper in bulk.
+
+        func(keys) runs once for the keys nobody else has in flight and returns
+        {key: result}; keys already in flight are waited on, up to timeout
+        seconds in total. Returns {key: result}, leaving out keys whose call
+        raised or is still running when the timeout passes.
+        """
+        own = {}
+        others = {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                call = self._calls.get(key)
+                if call is None:
+                    own[key] = self._calls[key] = _Call()
+                else:
+                    others[key] = call
+                    self.coalesced += 1
+
+        results = {}
+        if own:
+            try:
+                fetched = func(list(own))
+                for key, call in own.items():
+                    call.result = results[key] = fetched.get(key)
+            except BaseException as e:
+                for call in own.values():
+                    call.error = e
+                raise
+            finally:
+                with self._lock:
+                    for key in own:
+                        del self._calls[key]
+                for call in own.values():
+                    call.done.set()
+
+        end = None if timeout is None else time.monotonic() + timeout
+        for key, call in others.items():
+            remaining = None if end is None else max(0, end - time.monotonic())
+            if call.done.wait(remaining) and call.error is None:
+                results[key] = call.result
+        return results
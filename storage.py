@@ -0,0 +1,188 @@
+import json
+import os
+import threading
+import time
+
+from connections import SQLiteConnections
+from persistence import load_investments, save_investment, delete_investment, changed_on_disk, locked
+
+# Which backend Portfolio uses when none is passed in: "json" or "sqlite"
+STORAGE_BACKEND = os.environ.get("FINSIGHT_STORAGE", "json")
+SQLITE_PATH = os.environ.get("FINSIGHT_SQLITE_PATH", "data/finsight.db")
+
+
+class JsonStorage:
+    """
+    Single shared portfolio kept in data/portfolio.json (see persistence.py).
+
+    The JSON file has no notion of users, so the user argument is ignored and
+    everyone sees the same positions. Changes written by other worker
+    processes are picked up on the next access.
+    """
+
+    def __init__(self):
+        self._data = None
+        # Bumped whenever the positions change, by this process or (on reload) another
+        self._version = 0
+
+    def version(self, user):
+        """Token that changes whenever the positions change; read it before load()"""
+        with locked():
+            self._loaded()
+            return self._version
+
+    def load(self, user):
+        """A private copy of the positions; callers may modify it without affecting other requests"""
+        with locked():
+            return {ticker: dict(record) for ticker, record in self._loaded().items()}
+
+    def update(self, user, ticker, func):
+        """Replace the position for ticker with func(current record or None) and persist it"""
+        # persistence.locked() also excludes other processes, and is released while
+        # waiting for a group commit so concurrent requests share one flush
+        with locked():
+            data = self._loaded()
+            current = data.get(ticker)
+            record = func(dict(current) if current is not None else None)
+            data[ticker] = record
+            self._version += 1
+            save_investment(ticker, record)
+            return record
+
+    def delete(self, user, ticker):
+        """Remove the position for ticker; returns False if there was none"""
+        with locked():
+            data = self._loaded()
+            if ticker not in data:
+                return False
+            del data[ticker]
+            self._version += 1
+            delete_investment(ticker)
+            return True
+
+    def held_tickers(self):
+        with locked():
+            return list(self._loaded())
+
+    def _loaded(self):
+        """The shared positions dict, reloaded when another process changed the files. Caller holds locked()."""
+        if self._data is None or changed_on_disk():
+            # A new dict rather than an in-place update: copies handed out earlier stay consistent
+            self._data = load_investments()
+            self._version += 1
+        return self._data
+
+
+class SQLiteStorage:
+    """
+    Per-user positions in SQLite, keyed by (user, ticker).
+
+    Runs in WAL mode so several worker processes can read while one writes.
+    Every read or update touches only the rows of one user, and updates are
+    read-modify-write inside an immediate transaction so concurrent workers
+    cannot lose each other's changes.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS positions (
+            user TEXT NOT NULL,
+            ticker TEXT NOT NULL,
+            amount_invested REAL NOT NULL DEFAULT 0,
+            data TEXT NOT NULL DEFAULT '{}',
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (user, ticker)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_positions_ticker ON positions (ticker);
+    """
+
+    def __init__(self, path=SQLITE_PATH, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._connections = SQLiteConnections(path, busy_timeout)
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self):
+        return self._connections.get()
+
+    def version(self, user):
+        """Token that changes whenever user's positions change; read it before load().
+        Every write sets updated_at and a delete changes the count, so either moves it."""
+        return tuple(self._connection().execute(
+            "SELECT COUNT(*), MAX(updated_at) FROM positions WHERE user = ?", (user or "",)
+        ).fetchone())
+
+    def load(self, user):
+        rows = self._connection().execute(
+            "SELECT ticker, data FROM positions WHERE user = ?", (user or "",)
+        )
+        return {ticker: json.loads(data) for ticker, data in rows}
+
+    def update(self, user, ticker, func):
+        """Replace the position for ticker with func(current record or None) in one transaction"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT data FROM positions WHERE user = ? AND ticker = ?", (user or "", ticker)
+            ).fetchone()
+            record = func(json.loads(row[0]) if row else None)
+            conn.execute(
+                "INSERT INTO positions (user, ticker, amount_invested, data, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (user, ticker) DO UPDATE SET "
+                "amount_invested = excluded.amount_invested, data = excluded.data, "
+                "updated_at = excluded.updated_at",
+                (user or "", ticker, record.get('amount_invested', 0), json.dumps(record), time.time())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return record
+
+    def delete(self, user, ticker):
+        """Remove the position for ticker; returns False if there was none"""
+        cursor = self._connection().execute(
+            "DELETE FROM positions WHERE user = ? AND ticker = ?", (user or "", ticker)
+        )
+        return cursor.rowcount > 0
+
+    def held_tickers(self):
+        """Every ticker held by any user, read from the ticker index"""
+        return [row[0] for row in self._connection().execute("SELECT DISTINCT ticker FROM positions")]
+
+    def import_investments(self, user, investments):
+        """Bulk-load a dict of positions for user, e.g. from data/portfolio.json"""
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO positions (user, ticker, amount_invested, data, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (user or "", ticker, record.get('amount_invested', 0), json.dumps(record), now)
+                    for ticker, record in investments.items()
+                ]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+_default_storage = None
+_default_storage_lock = threading.Lock()
+
+def get_default_storage():
+    """The process-wide storage backend selected by FINSIGHT_STORAGE"""
+    global _default_storage
+    with _default_storage_lock:
+        if _default_storage is None:
+            if STORAGE_BACKEND == "sqlite":
+                _default_storage = SQLiteStorage()
+            elif STORAGE_BACKEND == "json":
+                _default_storage = JsonStorage()
+            else:
+                raise ValueError(f"Unknown storage backend: {STORAGE_BACKEND}")
+        return _default_storage
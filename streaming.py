@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+
+from portfolio import PortfolioSnapshot
+from utils import refresh_quotes, get_cached_quotes
+
+# Seconds between quote polls while at least one dashboard is connected
+STREAM_POLL_INTERVAL = float(os.environ.get("FINSIGHT_STREAM_INTERVAL", 15))
+# Idle streams get a comment line this often so proxies keep them open and
+# disconnected clients are noticed
+STREAM_HEARTBEAT = 20
+
+
+class Subscription:
+    """One connected dashboard: the tickers it shows and the ones changed since it last read"""
+
+    def __init__(self, get_tickers):
+        self.get_tickers = get_tickers
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def push(self, tickers):
+        with self._lock:
+            self._pending |= tickers
+            self._ready.set()
+
+    def wait(self, timeout=None):
+        """Tickers changed since the last call, waiting up to timeout for some; may be empty"""
+        self._ready.wait(timeout)
+        with self._lock:
+            changed, self._pending = self._pending, set()
+            self._ready.clear()
+        return changed
+
+
+class QuotePoller:
+    """
+    One background poll of quotes for every connected dashboard.
+
+    Each pass refreshes the union of all subscribers' tickers with a single
+    batched provider request, so the provider load does not grow with the
+    number of open pages. Subscribers are told which of their tickers changed
+    price. The thread runs only while someone is subscribed.
+    """
+
+    def __init__(self, interval=STREAM_POLL_INTERVAL, refresh=refresh_quotes, read=get_cached_quotes):
+        self.interval = interval
+        self.refresh = refresh
+        self.read = read
+        self._subscribers = set()
+        self._last_prices = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def subscribe(self, get_tickers):
+        subscription = Subscription(get_tickers)
+        with self._lock:
+            self._subscribers.add(subscription)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="finsight-stream", daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+            if not self._subscribers:
+                # Let the thread notice now instead of after one more poll
+                self._wake.set()
+
+    def poll_once(self):
+        """Refresh every subscribed ticker once and notify subscribers; returns the changed tickers"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        wanted = {}
+        for subscription in subscribers:
+            try:
+                wanted[subscription] = {t.upper().strip() for t in subscription.get_tickers()}
+            except Exception as e:
+                print(f"Warning: could not read tickers for a stream: {e}")
+        tickers = set().union(*wanted.values()) if wanted else set()
+        if not tickers:
+            return set()
+
+        try:
+            self.refresh(sorted(tickers))
+        except Exception as e:
+            print(f"Warning: stream quote refresh failed: {e}")
+
+        quotes = self.read(tickers)
+        changed = {
+            ticker for ticker, quote in quotes.items()
+            if quote['price'] != self._last_prices.get(ticker)
+        }
+        for ticker in changed:
+            self._last_prices[ticker] = quotes[ticker]['price']
+
+        for subscription, mine in wanted.items():
+            if changed & mine:
+                subscription.push(changed & mine)
+        return changed
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    self._last_prices.clear()
+                    return
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"Warning: stream poll failed: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+def update_event(investments, changed):
+    """SSE 'update' event with rows for the changed tickers, every weight and the totals"""
+    snapshot = PortfolioSnapshot(investments, get_cached_quotes(list(investments)))
+    payload = {
+        'rows': {t: snapshot.summary[t] for t in sorted(changed) if t in snapshot.summary},
+        # One price moving shifts every position's weight
+        'weights': {t: row['weight'] for t, row in snapshot.summary.items() if 'weight' in row},
+        'totals': {
+            'total_invested': snapshot.total_invested,
+            'current_value': snapshot.current_value,
+            'profit_loss': snapshot.profit_loss,
+            'day_change': snapshot.day_change,
+            'day_change_percent': snapshot.day_change_percent,
+        }
+    }
+    return f"event: update\ndata: {json.dumps(payload)}\n\n"
+
+
+def event_stream(subscription, get_investments, on_close=None, heartbeat=STREAM_HEARTBEAT):
+    """Generator of SSE text for one subscription; ends (and calls on_close) when the client goes away"""
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            changed = subscription.wait(heartbeat)
+            if changed:
+                yield update_event(get_investments(), changed)
+            else:
+                yield ": keep-alive\n\n"
+    finally:
+        if on_close is not None:
+            on_close(subscription)
@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+import time
+
+# File to persist known ticker symbols
+SYMBOLS_PATH = "data/symbols.json"
+
+VALID_TTL = 30 * 24 * 3600  # re-check listed symbols monthly (delistings)
+INVALID_TTL = 24 * 3600  # unknown symbols may get listed, re-check daily
+SAVE_DELAY = 2.0  # seconds; answers recorded meanwhile go to disk in one write
+
+
+class SymbolIndex:
+    """
+    Persisted ticker -> validity map so add_investment doesn't need the provider.
+
+    Each entry stores whether the symbol was valid and when that answer
+    expires. Lookups are a dict access; expired or unknown symbols return None
+    and the caller validates them through the provider and calls record().
+
+    Writing the file costs O(N) in the number of symbols, so record() doesn't
+    save right away: the first new answer starts a save_delay timer and
+    everything recorded until it fires is written together. flush() saves
+    pending answers immediately.
+    """
+
+    def __init__(self, path=SYMBOLS_PATH, valid_ttl=VALID_TTL, invalid_ttl=INVALID_TTL, save_delay=SAVE_DELAY):
+        self.path = path
+        self.valid_ttl = valid_ttl
+        self.invalid_ttl = invalid_ttl
+        self.save_delay = save_delay
+        # Read from disk on first use, so creating the index at import costs nothing
+        self._symbols = None
+        self._dirty = False
+        self._save_timer = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        # Held while writing, so an older snapshot can't replace a newer file
+        self._save_lock = threading.Lock()
+
+    def load(self):
+        """(Re)load the index from disk, starting empty if it is missing or unreadable"""
+        symbols = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"Warning: ignoring unreadable symbol index {self.path}: {e}")
+                data = {}
+            symbols = {
+                ticker: (bool(entry[0]), float(entry[1]))
+                for ticker, entry in data.items()
+            }
+        with self._lock:
+            self._symbols = symbols
+
+    def lookup(self, ticker):
+        """True/False if the answer for ticker is known and unexpired, otherwise None"""
+        entry = self._entries().get(ticker)
+        if entry is None:
+            return None
+        valid, expires_at = entry
+        if expires_at <= time.time():
+            return None
+        return valid
+
+    def record(self, ticker, valid):
+        """Remember the provider's answer for ticker; it reaches disk within save_delay seconds"""
+        ttl = self.valid_ttl if valid else self.invalid_ttl
+        self._entries()
+        with self._lock:
+            self._symbols[ticker] = (bool(valid), time.time() + ttl)
+            self._dirty = True
+            if self.save_delay > 0 and self._save_timer is None:
+                self._save_timer = threading.Timer(self.save_delay, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+        if self.save_delay <= 0:
+            self.flush()
+
+    def flush(self):
+        """Write answers recorded since the last save to disk"""
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                symbols = dict(self._symbols)
+            self._save(symbols)
+
+    def _entries(self):
+        if self._symbols is None:
+            with self._load_lock:
+                if self._symbols is None:
+                    self.load()
+        return self._symbols
+
+    def _save(self, symbols):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({t: [v, exp] for t, (v, exp) in symbols.items()}, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except IOError as e:
+            print(f"Warning: could not save symbol index: {e}")
+
+    def __len__(self):
+        return len(self._entries())
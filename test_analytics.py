@@ -0,0 +1,61 @@
+import math
+import time
+import unittest
+
+import numpy as np
+
+from analytics import PortfolioAnalytics
+
+
+class TestPortfolioAnalytics(unittest.TestCase):
+    def setUp(self):
+        investments = {
+            "AAPL": {"amount_invested": 100.0},
+            "MSFT": {"amount_invested": 300.0},
+            "BAD": {"amount_invested": 50.0},
+        }
+        quotes = {
+            "AAPL": {"price": 150.0, "prev_close": 100.0},
+            "MSFT": {"price": 250.0, "prev_close": 250.0},
+        }
+        self.analytics = PortfolioAnalytics.from_investments(investments, quotes)
+
+    def test_totals(self):
+        totals = self.analytics.totals()
+        self.assertEqual(totals["total_invested"], 450.0)
+        self.assertEqual(totals["current_value"], 400.0)
+        self.assertEqual(totals["profit_loss"], -50.0)
+        self.assertEqual(totals["day_change"], 50.0)
+        self.assertAlmostEqual(totals["day_change_percent"], 50.0 / 350.0 * 100)
+
+    def test_rows(self):
+        aapl = self.analytics.row("AAPL")
+        self.assertEqual(aapl["profit_loss"], 50.0)
+        self.assertEqual(aapl["return_percent"], 50.0)
+        self.assertAlmostEqual(aapl["weight"], 150.0 / 400.0)
+
+        # Unpriced positions have no value or P/L, but still count as invested
+        bad = self.analytics.row("BAD")
+        self.assertEqual(bad["market_value"], 0.0)
+        self.assertIsNone(bad["profit_loss"])
+
+    def test_quantities_scale_value(self):
+        analytics = PortfolioAnalytics(["AAPL"], [100.0], quantity=[2.0], price=[60.0])
+        self.assertEqual(analytics.total_value, 120.0)
+        self.assertTrue(math.isnan(analytics.change_percent[0]))
+
+    def test_reprice_large_book_is_fast(self):
+        n = 10_000
+        analytics = PortfolioAnalytics([f"T{i}" for i in range(n)], np.full(n, 100.0))
+        prices = np.random.default_rng(0).uniform(50, 150, n)
+        started = time.perf_counter()
+        for _ in range(10):
+            analytics.reprice(prices, prices * 0.99)
+        per_pass = (time.perf_counter() - started) / 10
+        self.assertAlmostEqual(analytics.total_value, prices.sum())
+        # Generous bound so slow CI machines don't flake; typically well under 1ms
+        self.assertLess(per_pass, 0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
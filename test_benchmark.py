@@ -0,0 +1,33 @@
+import json
+import os
+import tempfile
+import unittest
+
+import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_small_sweep_runs_offline_and_saves(self):
+        results = benchmark.run(sizes=[5], concurrency_levels=[1, 2], paths=list(benchmark.PATHS),
+                                calls=2, cold_runs=1, latency=0.0, failure_rate=0.2, log=lambda line: None,
+                                startup_runs=1)
+        by_path = {(r['path'], r['mode'], r['concurrency']) for r in results}
+        self.assertIn(("startup", "cold", 1), by_path)
+        self.assertIn(("index", "cold", 1), by_path)
+        self.assertIn(("save_investments", "warm", 2), by_path)
+        self.assertNotIn(("save_investments", "cold", 1), by_path)
+        self.assertTrue(all(r['errors'] == 0 for r in results))
+        self.assertTrue(all(r['p50_ms'] <= r['p99_ms'] for r in results))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = benchmark.save_results(results, {'sizes': [5]}, directory)
+            with open(path) as f:
+                saved = json.load(f)
+            self.assertEqual(saved['results'], results)
+            lines = []
+            benchmark.compare(path, path, log=lines.append)
+            self.assertEqual(len(lines), len(results) + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from connections import SQLiteConnections
+
+
+class TestSQLiteConnections(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.connections = SQLiteConnections(os.path.join(self.tmpdir.name, "sub", "test.db"))
+
+    def test_one_connection_per_thread(self):
+        conn = self.connections.get()
+        self.assertIs(self.connections.get(), conn)
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.connections.get()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], conn)
+
+    def test_forked_child_opens_its_own_connection(self):
+        conn = self.connections.get()
+        with mock.patch("connections.os.getpid", return_value=os.getpid() + 1):
+            child = self.connections.get()
+        self.assertIsNot(child, conn)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from history_store import HistoryStore, BAR_DTYPE, bars_from_frame, today_epoch_day
+
+
+def _frame(days, closes):
+    index = pd.DatetimeIndex([pd.Timestamp(d) for d in days], tz="America/New_York")
+    return pd.DataFrame({
+        "Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": [1000] * len(closes)
+    }, index=index)
+
+
+class TestHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.requests = []
+        self.today = date.today()
+        self.days = [self.today - timedelta(days=n) for n in (3, 2, 1)]
+
+        def fetch(ticker, start):
+            self.requests.append(start)
+            return bars_from_frame(_frame([d for d in self.days if d >= start],
+                                          [float(i) for i, d in enumerate(self.days) if d >= start]))
+
+        self.store = HistoryStore(self.tmpdir.name, fetch_bars=fetch, min_refresh_interval=0)
+
+    def test_update_only_fetches_from_last_stored_date(self):
+        self.store.update("AAPL")
+        self.assertEqual(len(self.store.bars("AAPL")), 3)
+
+        self.days.append(self.today)
+        self.store.update("AAPL")
+        self.assertEqual(self.requests[-1], self.days[-2])
+        bars = self.store.bars("AAPL")
+        self.assertEqual(len(bars), 4)
+        self.assertEqual(bars["date"][-1], today_epoch_day())
+        self.assertEqual(self.store.previous_close("AAPL"), 2.0)
+
+    def test_todays_bar_is_refetched_once_older_than_the_ttl(self):
+        self.days.append(self.today)
+        store = HistoryStore(self.tmpdir.name, fetch_bars=self.store.fetch_bars, live_bar_ttl=60)
+        store.update("AAPL")
+        self.assertEqual(len(self.requests), 1)
+
+        # Fresh enough: served as stored
+        store.update("AAPL")
+        self.assertEqual(len(self.requests), 1)
+
+        # An hour later the intraday bar is fetched again and replaced in place
+        old = os.path.getmtime(store.path("AAPL")) - 3600
+        os.utime(store.path("AAPL"), (old, old))
+        store._last_checked["AAPL"] = old
+        store.update("AAPL")
+        self.assertEqual(self.requests[-1], self.today)
+        self.assertEqual(len(store.bars("AAPL")), 4)
+
+    def test_bars_are_a_memory_map(self):
+        self.store.update("AAPL")
+        bars = self.store.bars("AAPL")
+        self.assertIsInstance(bars, np.memmap)
+        self.assertEqual(os.path.getsize(self.store.path("AAPL")), 3 * BAR_DTYPE.itemsize)
+
+    def test_same_day_bar_is_replaced_in_place(self):
+        bars = bars_from_frame(_frame(self.days, [1.0, 2.0, 3.0]))
+        self.store.append("AAPL", bars)
+        corrected = bars_from_frame(_frame(self.days[-1:], [3.5]))
+        self.assertEqual(self.store.append("AAPL", corrected), 1)
+        self.assertEqual(len(self.store.bars("AAPL")), 3)
+        self.assertEqual(self.store.latest_close("AAPL"), 3.5)
+        # Older bars are never rewritten
+        self.assertEqual(self.store.append("AAPL", bars[:1]), 0)
+
+    def test_unknown_ticker_is_empty(self):
+        self.assertEqual(len(self.store.bars("NOPE")), 0)
+        self.assertIsNone(self.store.previous_close("NOPE"))
+
+
+if __name__ == "__main__":
+    unittest.main()
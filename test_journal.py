@@ -0,0 +1,122 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import persistence
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        for name, filename in (("DATA_PATH", "portfolio.json"), ("JOURNAL_PATH", "portfolio.journal"),
+                               ("LOCK_PATH", "portfolio.lock")):
+            patcher = mock.patch.object(persistence, name, os.path.join(self.tmpdir.name, filename))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_mutations_are_appended_and_replayed(self):
+        persistence.save_investments({"AAPL": {"amount_invested": 1000}})
+        persistence.save_investment("MSFT", {"amount_invested": 50})
+        persistence.save_investment("AAPL", {"amount_invested": 1500})
+        persistence.delete_investment("MSFT")
+
+        # The snapshot is untouched; the journal carries the changes
+        with open(persistence.DATA_PATH) as f:
+            self.assertEqual(json.load(f), {"AAPL": {"amount_invested": 1000}})
+        self.assertEqual(persistence.load_investments(), {"AAPL": {"amount_invested": 1500}})
+
+    def test_torn_final_record_is_ignored(self):
+        persistence.save_investment("AAPL", {"amount_invested": 10})
+        with open(persistence.JOURNAL_PATH, "a") as f:
+            f.write('{"op":"set","ticker":"MSFT","da')
+        self.assertEqual(persistence.load_investments(), {"AAPL": {"amount_invested": 10}})
+
+        # The next append lands on a clean line
+        persistence.save_investment("GOOGL", {"amount_invested": 5})
+        self.assertEqual(set(persistence.load_investments()), {"AAPL", "GOOGL"})
+
+    def test_compaction_folds_journal_into_snapshot(self):
+        for i in range(5):
+            persistence.save_investment(f"T{i}", {"amount_invested": i})
+        persistence.delete_investment("T0")
+        persistence.compact_journal()
+
+        self.assertEqual(os.path.getsize(persistence.JOURNAL_PATH), 0)
+        with open(persistence.DATA_PATH) as f:
+            self.assertEqual(sorted(json.load(f)), ["T1", "T2", "T3", "T4"])
+
+    def test_writes_are_timed_and_counted(self):
+        from metrics import PERSISTENCE_WRITE_LATENCY, PERSISTENCE_WRITE_BYTES
+        writes = PERSISTENCE_WRITE_LATENCY.count("journal")
+        written = PERSISTENCE_WRITE_BYTES.value("journal")
+        persistence.save_investment("AAPL", {"amount_invested": 10})
+        self.assertEqual(PERSISTENCE_WRITE_LATENCY.count("journal"), writes + 1)
+        self.assertEqual(PERSISTENCE_WRITE_BYTES.value("journal") - written,
+                         os.path.getsize(persistence.JOURNAL_PATH))
+
+    def test_corrupt_snapshot_is_kept_aside(self):
+        with open(persistence.DATA_PATH, "w") as f:
+            f.write("{not json")
+        self.assertEqual(persistence.load_investments(), {})
+        self.assertTrue(any(".corrupt-" in name for name in os.listdir(self.tmpdir.name)))
+
+
+def _add_in_subprocess(tmpdir, count):
+    """Worker process body: increment AAPL count times through JsonStorage."""
+    from storage import JsonStorage
+    persistence.DATA_PATH = os.path.join(tmpdir, "portfolio.json")
+    persistence.JOURNAL_PATH = os.path.join(tmpdir, "portfolio.journal")
+    persistence.LOCK_PATH = os.path.join(tmpdir, "portfolio.lock")
+    storage = JsonStorage()
+    for _ in range(count):
+        storage.update(None, "AAPL", lambda r: {"amount_invested": (r or {"amount_invested": 0})["amount_invested"] + 1})
+
+
+class TestMultiProcess(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        for name, filename in (("DATA_PATH", "portfolio.json"), ("JOURNAL_PATH", "portfolio.journal"),
+                               ("LOCK_PATH", "portfolio.lock")):
+            patcher = mock.patch.object(persistence, name, os.path.join(self.tmpdir.name, filename))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @unittest.skipIf(persistence.fcntl is None, "needs fcntl for inter-process locking")
+    def test_workers_do_not_lose_updates(self):
+        import multiprocessing
+        ctx = multiprocessing.get_context("fork")
+        workers = [ctx.Process(target=_add_in_subprocess, args=(self.tmpdir.name, 25)) for _ in range(4)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join(30)
+        self.assertEqual(persistence.load_investments()["AAPL"]["amount_invested"], 100)
+
+    def test_reload_picks_up_other_writers(self):
+        from storage import JsonStorage
+        storage = JsonStorage()
+        self.assertEqual(storage.load(None), {})
+        self.assertFalse(persistence.changed_on_disk())
+
+        # Simulate another process appending to the journal
+        with open(persistence.JOURNAL_PATH, "a") as f:
+            f.write('{"op":"set","ticker":"MSFT","data":{"amount_invested":5}}\n')
+        self.assertTrue(persistence.changed_on_disk())
+        self.assertEqual(storage.load(None), {"MSFT": {"amount_invested": 5}})
+
+    def test_concurrent_writes_share_one_flush(self):
+        from concurrent.futures import ThreadPoolExecutor
+        with mock.patch.object(persistence, "FLUSH_WINDOW", 0.05), \
+                mock.patch.object(persistence.os, "fsync", wraps=os.fsync) as fsync:
+            with ThreadPoolExecutor(max_workers=10) as pool:
+                list(pool.map(lambda i: persistence.save_investment(f"T{i}", {"amount_invested": i}), range(10)))
+        self.assertLess(fsync.call_count, 10)
+        self.assertEqual(len(persistence.load_investments()), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
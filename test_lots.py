@@ -0,0 +1,77 @@
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import lots
+from analytics import PortfolioAnalytics
+
+
+class TestLots(unittest.TestCase):
+    def test_buy_packs_lots_and_tracks_cost(self):
+        record = lots.buy(None, 10, 1000.0, day=1)
+        record = lots.buy(record, 5, 600.0, day=2)
+        held = lots.decode_lots(record)
+        self.assertEqual(held['date'].tolist(), [1, 2])
+        self.assertEqual(held['shares'].tolist(), [10.0, 5.0])
+        self.assertEqual(record['amount_invested'], 1600.0)
+        self.assertEqual(lots.position_shares(record), 15.0)
+
+    def test_sell_is_fifo_with_realized_pl(self):
+        record = lots.buy(None, 10, 1000.0, day=1)   # $100/share
+        record = lots.buy(record, 10, 2000.0, day=2)  # $200/share
+        record, realized = lots.sell(record, 15, 15 * 150.0)
+        # 10 @ 100 + 5 @ 200 = 2000 cost for 2250 proceeds
+        self.assertAlmostEqual(realized, 250.0)
+        self.assertAlmostEqual(record['realized_pl'], 250.0)
+        self.assertAlmostEqual(record['amount_invested'], 1000.0)
+        held = lots.decode_lots(record)
+        self.assertEqual(held['date'].tolist(), [2])
+        self.assertAlmostEqual(held['shares'][0], 5.0)
+
+        record, _ = lots.sell(record, 5, 5 * 100.0)
+        self.assertEqual(len(lots.decode_lots(record)), 0)
+        self.assertAlmostEqual(record['realized_pl'], -250.0)
+        self.assertEqual(record['amount_invested'], 0.0)
+
+    def test_cannot_oversell(self):
+        record = lots.buy(None, 1, 100.0)
+        with self.assertRaises(ValueError):
+            lots.sell(record, 2, 200.0)
+
+    def test_legacy_record_is_one_share(self):
+        record = {'amount_invested': 500}
+        self.assertEqual(lots.position_shares(record), 1.0)
+        record = lots.buy(record, 2, 100.0)
+        self.assertEqual(lots.position_shares(record), 3.0)
+        self.assertEqual(record['amount_invested'], 600.0)
+
+    def test_share_total_is_stored_so_valuation_skips_the_lots(self):
+        record = lots.buy(None, 10, 1000.0)
+        record, _ = lots.sell(record, 4, 4 * 120.0)
+        self.assertEqual(record['shares'], 6.0)
+        with mock.patch.object(lots, "decode_lots") as decode:
+            self.assertEqual(lots.position_shares(record), 6.0)
+            analytics = PortfolioAnalytics.from_investments({'AAPL': record}, {'AAPL': {'price': 110.0}})
+        decode.assert_not_called()
+        self.assertAlmostEqual(analytics.total_value, 660.0)
+
+    def test_large_lot_book_stays_compact(self):
+        record = {'lots': lots.encode_lots(np.zeros(20_000, dtype=lots.LOT_DTYPE))}
+        # base64 of 24 bytes per lot
+        self.assertLess(sys.getsizeof(record['lots']) / 20_000, 40)
+
+    def test_analytics_uses_shares_and_realized_pl(self):
+        record = lots.buy(None, 10, 1000.0)
+        record, _ = lots.sell(record, 4, 4 * 120.0)
+        analytics = PortfolioAnalytics.from_investments({'AAPL': record}, {'AAPL': {'price': 110.0}})
+        totals = analytics.totals()
+        self.assertAlmostEqual(totals['current_value'], 660.0)
+        self.assertAlmostEqual(totals['unrealized_pl'], 60.0)
+        self.assertAlmostEqual(totals['realized_pl'], 80.0)
+        self.assertAlmostEqual(totals['profit_loss'], 140.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
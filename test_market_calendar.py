@@ -0,0 +1,73 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from market_calendar import MarketCalendar, nyse_holidays, nyse_early_closes, easter
+
+NY = ZoneInfo("America/New_York")
+
+
+class TestHolidayRules(unittest.TestCase):
+    def test_2024_holidays(self):
+        self.assertEqual(sorted(nyse_holidays(2024)), [
+            date(2024, 1, 1), date(2024, 1, 15), date(2024, 2, 19), date(2024, 3, 29),
+            date(2024, 5, 27), date(2024, 6, 19), date(2024, 7, 4), date(2024, 9, 2),
+            date(2024, 11, 28), date(2024, 12, 25),
+        ])
+        self.assertEqual(sorted(nyse_early_closes(2024)),
+                         [date(2024, 7, 3), date(2024, 11, 29), date(2024, 12, 24)])
+
+    def test_observed_days(self):
+        # July 4th 2026 is a Saturday: closed Friday, and no early close that day
+        self.assertIn(date(2026, 7, 3), nyse_holidays(2026))
+        self.assertNotIn(date(2026, 7, 3), nyse_early_closes(2026))
+        # New Year's Day 2022 was a Saturday and was not made up
+        self.assertNotIn(date(2021, 12, 31), nyse_holidays(2021))
+        self.assertNotIn(date(2021, 12, 31), nyse_holidays(2022))
+
+    def test_easter(self):
+        self.assertEqual(easter(2025), date(2025, 4, 20))
+        self.assertEqual(easter(2019), date(2019, 4, 21))
+
+
+class TestMarketCalendar(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "calendar.json")
+        self.calendar = MarketCalendar(path=self.path, url=None)
+
+    def test_sessions(self):
+        self.assertEqual(self.calendar.status(datetime(2024, 3, 5, 10, 0, tzinfo=NY)), "OPEN")
+        self.assertEqual(self.calendar.status(datetime(2024, 3, 5, 9, 0, tzinfo=NY)), "CLOSED")
+        self.assertEqual(self.calendar.status(datetime(2024, 3, 5, 16, 0, tzinfo=NY)), "CLOSED")
+        self.assertEqual(self.calendar.status(datetime(2024, 3, 9, 12, 0, tzinfo=NY)), "CLOSED")  # Saturday
+        self.assertEqual(self.calendar.status(datetime(2024, 12, 25, 12, 0, tzinfo=NY)), "CLOSED")
+        self.assertEqual(self.calendar.status(datetime(2024, 12, 24, 13, 30, tzinfo=NY)), "CLOSED")
+        # Any timezone works: 15:00 UTC is 10:00 in New York in March
+        self.assertTrue(self.calendar.is_open(datetime(2024, 3, 5, 15, 0, tzinfo=ZoneInfo("UTC"))))
+
+    def test_next_open_skips_weekend_and_holiday(self):
+        friday_evening = datetime(2024, 8, 30, 17, 0, tzinfo=NY)  # Monday is Labor Day
+        self.assertEqual(self.calendar.next_open(friday_evening), datetime(2024, 9, 3, 9, 30, tzinfo=NY))
+
+    def test_overrides_file(self):
+        with open(self.path, "w") as f:
+            f.write('{"closed": ["2024-03-05"], "early_close": {"2024-03-06": "12:00"}}')
+        self.calendar.load()
+        self.assertEqual(self.calendar.status(datetime(2024, 3, 5, 10, 0, tzinfo=NY)), "CLOSED")
+        self.assertEqual(self.calendar.status(datetime(2024, 3, 6, 12, 30, tzinfo=NY)), "CLOSED")
+
+    def test_current_status_is_memoized(self):
+        self.calendar.status()
+        started = time.perf_counter()
+        for _ in range(1000):
+            self.calendar.status()
+        self.assertLess((time.perf_counter() - started) / 1000, 50e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
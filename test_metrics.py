@@ -0,0 +1,79 @@
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault("FINSIGHT_BACKGROUND_REFRESH", "0")
+
+import metrics
+import utils
+from providers import ProviderChain, StubProvider
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.Registry()
+
+    def test_counter_and_histogram_text_format(self):
+        calls = self.registry.counter("calls_total", "Calls", ("provider",))
+        latency = self.registry.histogram("latency_seconds", "Latency", ("provider",), buckets=(0.1, 1))
+        calls.inc("stub")
+        calls.inc("stub", amount=2)
+        latency.observe(0.05, "stub")
+        latency.observe(0.5, "stub")
+        latency.observe(3, "stub")
+
+        lines = self.registry.render().splitlines()
+        self.assertIn("# TYPE calls_total counter", lines)
+        self.assertIn('calls_total{provider="stub"} 3', lines)
+        self.assertIn('latency_seconds_bucket{provider="stub",le="0.1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{provider="stub",le="1"} 2', lines)
+        self.assertIn('latency_seconds_bucket{provider="stub",le="+Inf"} 3', lines)
+        self.assertIn('latency_seconds_sum{provider="stub"} 3.55', lines)
+        self.assertIn('latency_seconds_count{provider="stub"} 3', lines)
+
+    def test_collectors_run_at_render_time(self):
+        values = [1]
+        self.registry.collector(lambda: [("size", "gauge", "Size", [({}, values[0])])])
+        values[0] = 5
+        self.assertIn("size 5", self.registry.render().splitlines())
+
+    def test_label_values_are_escaped(self):
+        calls = self.registry.counter("calls_total", "Calls", ("route",))
+        calls.inc('a"b\\c')
+        self.assertIn('calls_total{route="a\\"b\\\\c"} 1', self.registry.render())
+
+    def test_duplicate_names_are_rejected(self):
+        self.registry.counter("calls_total", "Calls")
+        with self.assertRaises(ValueError):
+            self.registry.counter("calls_total", "Calls")
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        utils.clear_cache()
+        self.addCleanup(utils.clear_cache)
+        chain = ProviderChain([StubProvider(invalid={"INVALID"})])
+        patcher = mock.patch.object(utils, "_quote_providers", chain)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_provider_cache_and_route_metrics_are_exposed(self):
+        import main
+        client = main.app.test_client()
+        before = metrics.PROVIDER_CALLS.value("stub", "batch", "ok")
+        self.assertEqual(client.post("/prices", json={"tickers": ["AAPL"]}).status_code, 200)
+        self.assertEqual(client.post("/prices", json={"tickers": ["AAPL"]}).status_code, 200)
+        self.assertEqual(metrics.PROVIDER_CALLS.value("stub", "batch", "ok"), before + 1)
+
+        response = client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        text = response.get_data(as_text=True)
+        self.assertIn('finsight_provider_latency_seconds_count{provider="stub",kind="batch"}', text)
+        self.assertIn("finsight_quote_cache_hits_total", text)
+        self.assertIn('finsight_provider_breaker_open{provider="stub"} 0', text)
+        self.assertIn('finsight_http_request_seconds_count{route="/prices",method="POST",status="200"}', text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,34 @@
 import unittest
 import os
 import json
-from portfolio import Portfolio
-from utils import validate_ticker
+import tempfile
+import time
+from unittest import mock
+import utils
+import lots
+from portfolio import Portfolio, PortfolioSnapshot
+from providers import ProviderChain, StubProvider
+from storage import SQLiteStorage
+from symbol_index import SymbolIndex
+from utils import validate_ticker, StockPriceError
 
 class TestPortfolio(unittest.TestCase):
     def setUp(self):
         """Set up a fresh Portfolio instance before each test."""
-        self.portfolio = Portfolio()
+        # Offline: deterministic quotes, and nothing written to the real data directory
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        for name, value in (
+            ("_quote_providers", ProviderChain([StubProvider(invalid={"INVALID"})])),
+            ("_symbol_index", SymbolIndex(os.path.join(self.tmpdir.name, "symbols.json"), save_delay=0)),
+        ):
+            patcher = mock.patch.object(utils, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        utils.clear_cache()
+        self.addCleanup(utils.clear_cache)
+
+        self.portfolio = Portfolio(storage=SQLiteStorage(os.path.join(self.tmpdir.name, "finsight.db")))
         self.test_file = "test_portfolio_data.json"
 
     def tearDown(self):
@@ -46,5 +67,69 @@ class TestPortfolio(unittest.TestCase):
         self.assertTrue(validate_ticker("AAPL"))
         self.assertFalse(validate_ticker("INVALID"))
 
+    def test_snapshot_fetches_each_ticker_once(self):
+        """Summary and totals come from a single quote per ticker."""
+        self.portfolio.investments = {
+            "AAPL": {"amount_invested": 100},
+            "MSFT": {"amount_invested": 50},
+            "BAD": {"amount_invested": 10},
+        }
+
+        def fake_info(ticker):
+            if ticker == "BAD":
+                raise StockPriceError("no data")
+            return {"name": ticker, "price": 120.0 if ticker == "AAPL" else 40.0,
+                    "currency": "USD", "change": 1.0, "change_percent": 1.0}
+
+        with mock.patch("portfolio.get_stock_info", side_effect=fake_info) as info:
+            snapshot = self.portfolio.get_snapshot()
+
+        self.assertEqual(info.call_count, 3)
+        self.assertEqual(snapshot.total_invested, 160)
+        self.assertEqual(snapshot.current_value, 160.0)
+        self.assertEqual(snapshot.profit_loss, 0)
+        self.assertEqual(snapshot.summary["AAPL"]["profit_loss_per_stock"], 20.0)
+        self.assertIn("error", snapshot.summary["BAD"])
+
+class TestLargePortfolio(unittest.TestCase):
+    N = 10_000
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.storage = SQLiteStorage(os.path.join(self.tmpdir.name, "finsight.db"))
+        position = lots.buy(None, 10, 1000.0, day=19000)
+        self.storage.import_investments("alice", {f"T{i}": position for i in range(self.N)})
+        self.quotes = {f"T{i}": {"name": f"T{i}", "price": 101.0, "prev_close": 100.0, "currency": "USD",
+                                 "change": 1.0, "change_percent": 1.0} for i in range(self.N)}
+
+    def test_positions_are_reused_until_they_change(self):
+        positions = Portfolio(user="alice", storage=self.storage).positions()
+        self.assertIs(Portfolio(user="alice", storage=self.storage).positions(), positions)
+
+        with mock.patch("portfolio.validate_ticker", return_value=True):
+            Portfolio(user="alice", storage=self.storage).add_investment("NEW", 10.0, shares=1)
+        changed = Portfolio(user="alice", storage=self.storage).positions()
+        self.assertIsNot(changed, positions)
+        self.assertEqual(len(changed.tickers), self.N + 1)
+
+    def test_dashboard_valuation_of_10k_positions_is_fast(self):
+        """Once quotes are in, pricing the kept positions and building the summary is all that's left."""
+        Portfolio(user="alice", storage=self.storage).positions()
+        portfolio = Portfolio(user="alice", storage=self.storage)
+        started = time.perf_counter()
+        priced = portfolio.positions().with_quotes(self.quotes)
+        repriced = time.perf_counter() - started
+        snapshot = PortfolioSnapshot(portfolio.investments, self.quotes, portfolio.positions())
+        total = time.perf_counter() - started
+
+        self.assertAlmostEqual(priced.total_value, self.N * 1010.0)
+        self.assertAlmostEqual(snapshot.current_value, self.N * 1010.0)
+        self.assertEqual(len(snapshot.summary), self.N)
+        # Generous bounds so slow CI machines don't flake; typically ~3ms and ~25ms
+        self.assertLess(repriced, 0.03)
+        self.assertLess(total, 0.25)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,154 @@
+import time
+import unittest
+from unittest import mock
+
+import providers
+from providers import ProviderChain, StubProvider, AlphaVantageProvider, CircuitBreaker, build_providers
+
+
+class FailingProvider(StubProvider):
+    name = "failing"
+
+    def fetch_quote(self, ticker):
+        self.calls[ticker] += 1
+        raise providers.ProviderError("down")
+
+    def fetch_quotes(self, tickers):
+        raise providers.ProviderError("down")
+
+
+class TestStubProvider(unittest.TestCase):
+    def test_quotes_are_deterministic(self):
+        first = StubProvider().fetch_quote("AAPL")
+        second = StubProvider().fetch_quote("AAPL")
+        self.assertEqual(first['price'], second['price'])
+        self.assertEqual(StubProvider(prices={"AAPL": 123.0}).fetch_quote("AAPL")['price'], 123.0)
+        self.assertIsNone(StubProvider(invalid={"BAD"}).fetch_quote("BAD")['price'])
+
+
+class TestProviderChain(unittest.TestCase):
+    def test_fails_over_on_error(self):
+        failing, backup = FailingProvider(), StubProvider(prices={"AAPL": 5.0})
+        record = ProviderChain([failing, backup]).fetch_quote("AAPL")
+        self.assertEqual(record['price'], 5.0)
+        self.assertEqual(record['source'], "stub")
+        self.assertEqual(failing.calls["AAPL"], 1)
+
+    def test_fails_over_when_over_latency_budget(self):
+        slow = StubProvider(prices={"AAPL": 1.0}, latency=1.0, latency_budget=0.05)
+        fast = StubProvider(prices={"AAPL": 2.0})
+        started = time.monotonic()
+        record = ProviderChain([slow, fast]).fetch_quote("AAPL")
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(record['price'], 2.0)
+
+    def test_unknown_symbol_is_tried_everywhere_then_reported(self):
+        first, second = StubProvider(invalid={"BAD"}), StubProvider(invalid={"BAD"})
+        record = ProviderChain([first, second]).fetch_quote("BAD")
+        self.assertIsNone(record['price'])
+        self.assertEqual(second.calls["BAD"], 1)
+
+    def test_every_provider_failing_returns_none(self):
+        self.assertIsNone(ProviderChain([FailingProvider(), FailingProvider()]).fetch_quote("AAPL"))
+
+    def test_batch_only_sends_missing_tickers_to_the_next_provider(self):
+        primary = StubProvider(invalid={"MSFT"})
+        backup = StubProvider(prices={"MSFT": 7.0})
+        quotes = ProviderChain([primary, backup]).fetch_quotes(["AAPL", "MSFT"])
+        self.assertEqual(quotes["MSFT"]['price'], 7.0)
+        self.assertEqual(quotes["AAPL"]['source'], "stub")
+        self.assertEqual(dict(backup.calls), {"MSFT": 1})
+
+    def test_build_from_spec(self):
+        chain = build_providers("stub:2")
+        self.assertEqual([p.name for p in chain.providers], ["stub"])
+        self.assertEqual(chain.providers[0].latency_budget, 2.0)
+        with self.assertRaises(ValueError):
+            build_providers("nope")
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_on_error_rate_and_recovers_after_probe(self):
+        breaker = CircuitBreaker(window=10, min_calls=4, error_rate=0.5, recovery_time=0.05)
+        for ok in (True, False, True, False):
+            breaker.record(ok)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())   # the probe
+        self.assertFalse(breaker.allow())  # only one at a time
+        breaker.record(True)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(min_calls=1, recovery_time=0)
+        breaker.record(False)
+        self.assertTrue(breaker.allow())
+        breaker.record(False)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(breaker.trips, 2)
+
+    def test_open_provider_is_skipped_without_calling_it(self):
+        failing, backup = FailingProvider(), StubProvider()
+        chain = ProviderChain([failing, backup])
+        for _ in range(providers.BREAKER_MIN_CALLS + 3):
+            self.assertIsNotNone(chain.fetch_quote("AAPL"))
+        self.assertEqual(failing.calls["AAPL"], providers.BREAKER_MIN_CALLS)
+        self.assertEqual(chain.status()[0]['state'], CircuitBreaker.OPEN)
+
+    def test_slow_calls_count_as_failures(self):
+        # The last provider is waited on, but answering over budget still counts against it
+        chain = ProviderChain([StubProvider(latency=0.05, latency_budget=0.01)])
+        for _ in range(providers.BREAKER_MIN_CALLS):
+            self.assertIsNotNone(chain.fetch_quote("AAPL"))
+        self.assertIsNone(chain.fetch_quote("AAPL"))
+        self.assertEqual(chain.status()[0]['state'], CircuitBreaker.OPEN)
+
+
+class TestHedgedRequests(unittest.TestCase):
+    def test_slow_primary_is_hedged_to_backup(self):
+        primary = StubProvider(prices={"AAPL": 1.0}, latency_budget=2.0)
+        backup = StubProvider(prices={"AAPL": 2.0})
+        chain = ProviderChain([primary, backup], hedge=True)
+        for _ in range(providers.HEDGE_MIN_SAMPLES):
+            chain.latencies[0].add(0.01)
+
+        primary.latency = 0.5
+        started = time.monotonic()
+        record = chain.fetch_quote("AAPL")
+        self.assertLess(time.monotonic() - started, 0.3)
+        self.assertEqual(record['price'], 2.0)
+        self.assertEqual(backup.calls["AAPL"], 1)
+
+    def test_no_hedge_without_latency_history(self):
+        primary, backup = StubProvider(latency=0.05), StubProvider()
+        ProviderChain([primary, backup], hedge=True).fetch_quote("AAPL")
+        self.assertEqual(backup.calls["AAPL"], 0)
+
+
+class TestAlphaVantageProvider(unittest.TestCase):
+    def _session(self, payload):
+        response = mock.Mock()
+        response.json.return_value = payload
+        session = mock.Mock()
+        session.get.return_value = response
+        return session
+
+    def test_parses_global_quote(self):
+        session = self._session({"Global Quote": {"05. price": "101.50", "08. previous close": "100.00"}})
+        record = AlphaVantageProvider("key", session=session).fetch_quote("AAPL")
+        self.assertEqual((record['price'], record['prev_close']), (101.5, 100.0))
+        self.assertEqual(session.get.call_args.kwargs['params']['symbol'], "AAPL")
+
+    def test_rate_limit_is_an_error(self):
+        session = self._session({"Note": "Thank you for using Alpha Vantage! ..."})
+        with self.assertRaises(providers.ProviderError):
+            AlphaVantageProvider("key", session=session).fetch_quote("AAPL")
+
+    def test_session_is_shared_within_a_process(self):
+        self.assertIs(providers.get_session(), providers.get_session())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from quote_cache import QuoteCache, DiskQuoteCache
+
+
+class TestQuoteCache(unittest.TestCase):
+    def test_hit_and_miss_counters(self):
+        cache = QuoteCache(max_entries=10, ttl=60)
+        self.assertIsNone(cache.get("AAPL"))
+        cache.set("AAPL", {"price": 1.0})
+        self.assertEqual(cache.get("AAPL"), {"price": 1.0})
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_ttl_expiry_keeps_stale_record_for_peek(self):
+        cache = QuoteCache(ttl=0.01)
+        cache.set("AAPL", {"price": 1.0})
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("AAPL"))
+        self.assertEqual(cache.peek("AAPL"), {"price": 1.0})
+
+    def test_lru_eviction(self):
+        cache = QuoteCache(max_entries=2, ttl=60)
+        cache.set("A", {"price": 1.0})
+        cache.set("B", {"price": 2.0})
+        cache.get("A")  # A is now most recently used
+        cache.set("C", {"price": 3.0})
+        self.assertNotIn("B", cache)
+        self.assertIn("A", cache)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_negative_entries_expire_quickly(self):
+        cache = QuoteCache(ttl=60, negative_ttl=0.01)
+        cache.set_error("INVALID", "not found")
+        self.assertEqual(cache.get("INVALID"), {"error": "not found"})
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("INVALID"))
+
+    def test_error_keeps_last_good_record(self):
+        cache = QuoteCache(ttl=60)
+        cache.set("AAPL", {"price": 1.0, "name": "Apple"})
+        cache.set_error("AAPL", "timeout")
+        self.assertIn("error", cache.get("AAPL"))
+        self.assertEqual(cache.peek("AAPL")["name"], "Apple")
+
+    def test_concurrent_writers_respect_bound(self):
+        cache = QuoteCache(max_entries=50, ttl=60)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda i: cache.set(f"T{i}", {"price": i}), range(500)))
+        self.assertEqual(len(cache), 50)
+
+
+class TestDiskQuoteCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "quotes.db")
+
+    def _cache(self):
+        """A fresh in-memory cache over the shared file, as a new worker would have"""
+        return QuoteCache(ttl=60, backing=DiskQuoteCache(self.path))
+
+    def test_other_workers_read_fresh_quotes_from_disk(self):
+        self._cache().set("AAPL", {"price": 1.0, "fetched_at": time.time()})
+        other = self._cache()
+        self.assertEqual(other.get("AAPL")["price"], 1.0)
+        self.assertEqual(other.stats()["disk_hits"], 1)
+        # Now served from memory
+        other.get("AAPL")
+        self.assertEqual(other.stats()["hits"], 1)
+
+    def test_expired_disk_quotes_are_only_available_stale(self):
+        self._cache().set("AAPL", {"price": 1.0, "fetched_at": time.time() - 120})
+        restarted = self._cache()
+        self.assertIsNone(restarted.get("AAPL"))
+        self.assertEqual(restarted.peek("AAPL")["price"], 1.0)
+
+    def test_errors_stay_local_and_older_quotes_do_not_win(self):
+        first = self._cache()
+        first.set("AAPL", {"price": 2.0, "fetched_at": time.time()})
+        self._cache().set("AAPL", {"price": 1.0, "fetched_at": time.time() - 30})
+        self._cache().set_error("MSFT", "timeout")
+        other = self._cache()
+        self.assertEqual(other.get("AAPL")["price"], 2.0)
+        self.assertIsNone(other.get("MSFT"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+os.environ.setdefault("FINSIGHT_BACKGROUND_REFRESH", "0")
+
+import utils
+from providers import ProviderChain, StubProvider
+from response_cache import ResponseCache, make_etag
+from storage import SQLiteStorage
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_entries_expire_and_are_evicted(self):
+        cache = ResponseCache(max_entries=2, ttl=60)
+        cache.set("a", b"A")
+        cache.set("b", b"B")
+        self.assertEqual(cache.get("a"), b"A")
+        cache.set("c", b"C")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+
+        expiring = ResponseCache(ttl=0.01)
+        expiring.set("a", b"A")
+        time.sleep(0.02)
+        self.assertIsNone(expiring.get("a"))
+
+    def test_etag_is_stable_across_key_order(self):
+        self.assertEqual(make_etag({"a": 1, "b": 2}), make_etag({"b": 2, "a": 1}))
+        self.assertNotEqual(make_etag({"a": 1}), make_etag({"a": 2}))
+
+
+class TestConditionalResponses(unittest.TestCase):
+    def setUp(self):
+        import main
+        self.main = main
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        utils.clear_cache()
+        self.addCleanup(utils.clear_cache)
+        self.storage = SQLiteStorage(os.path.join(self.tmpdir.name, "finsight.db"))
+        self.storage.import_investments(None, {"AAPL": {"amount_invested": 100.0}})
+        for patcher in (
+            mock.patch.object(utils, "_quote_providers", ProviderChain([StubProvider(invalid={"BOGUS"})])),
+            mock.patch.object(main, "storage", self.storage),
+            mock.patch.object(main, "response_cache", ResponseCache(ttl=60)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = main.app.test_client()
+
+    def test_dashboard_is_reused_until_a_quote_or_position_changes(self):
+        # The first view fetches quotes, so there is nothing to tag yet
+        self.assertNotIn("ETag", self.client.get("/").headers)
+
+        with mock.patch.object(self.main, "render_template", wraps=self.main.render_template) as render:
+            first = self.client.get("/")
+            second = self.client.get("/")
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first.get_data(), second.get_data())
+        etag = first.headers["ETag"]
+        self.assertEqual(second.headers["ETag"], etag)
+
+        unchanged = self.client.get("/", headers={"If-None-Match": etag})
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(unchanged.get_data(), b"")
+
+        self.storage.import_investments(None, {"MSFT": {"amount_invested": 50.0}})
+        self.client.get("/")
+        self.assertNotEqual(self.client.get("/").headers["ETag"], etag)
+
+    def test_refreshed_quote_changes_the_etag(self):
+        self.client.get("/")
+        etag = self.client.get("/").headers["ETag"]
+        utils.refresh_quotes(["AAPL"])
+        response = self.client.get("/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_prices_support_if_none_match(self):
+        body = {"tickers": ["AAPL", "MSFT"]}
+        self.client.post("/prices", json=body)
+        response = self.client.post("/prices", json=body)
+        self.assertEqual(set(response.get_json()), {"AAPL", "MSFT"})
+
+        again = self.client.post("/prices", json=body, headers={"If-None-Match": response.headers["ETag"]})
+        self.assertEqual(again.status_code, 304)
+        other = self.client.post("/prices", json={"tickers": ["AAPL"]},
+                                 headers={"If-None-Match": response.headers["ETag"]})
+        self.assertEqual(other.status_code, 200)
+
+    def test_unknown_symbol_does_not_disable_tagging(self):
+        body = {"tickers": ["AAPL", "BOGUS"]}
+        self.client.post("/prices", json=body)
+        response = self.client.post("/prices", json=body)
+        self.assertEqual(response.get_json(), {"AAPL": mock.ANY, "BOGUS": None})
+        self.assertIn("ETag", response.headers)
+
+        again = self.client.post("/prices", json=body, headers={"If-None-Match": response.headers["ETag"]})
+        self.assertEqual(again.status_code, 304)
+        # Once the negative entry is replaced the tag changes
+        utils._quote_cache.set("BOGUS", {"price": 1.0, "fetched_at": time.time()})
+        retried = self.client.post("/prices", json=body, headers={"If-None-Match": response.headers["ETag"]})
+        self.assertEqual(retried.status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
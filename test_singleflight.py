@@ -0,0 +1,114 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import utils
+from providers import ProviderChain, StubProvider
+from singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def work(key):
+            calls.append(key)
+            release.wait(1)
+            return object()
+
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            futures = [pool.submit(flight.do, "AAPL", work, "AAPL") for _ in range(10)]
+            time.sleep(0.05)
+            release.set()
+            results = {id(f.result()) for f in futures}
+
+        self.assertEqual(calls, ["AAPL"])
+        self.assertEqual(len(results), 1)
+        self.assertEqual(flight.coalesced, 9)
+
+    def test_errors_reach_every_waiter_and_are_not_kept(self):
+        flight = SingleFlight()
+
+        def fail():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            flight.do("X", fail)
+        self.assertEqual(flight.do("X", lambda: 1), 1)
+
+    def test_waiters_give_up_after_the_timeout(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        self.addCleanup(release.set)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            leader = pool.submit(flight.do, "AAPL", release.wait, 5)
+            time.sleep(0.05)
+            with self.assertRaises(TimeoutError):
+                flight.do("AAPL", lambda: None, timeout=0.05)
+            release.set()
+            self.assertTrue(leader.result())
+
+
+class TestQuoteCoalescing(unittest.TestCase):
+    def setUp(self):
+        utils.clear_cache()
+        self.addCleanup(utils.clear_cache)
+        self.provider = StubProvider(prices={"AAPL": 10.0}, latency=0.1)
+        patcher = mock.patch.object(utils, "_quote_providers", ProviderChain([self.provider]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_thundering_herd_makes_one_provider_call(self):
+        lookups = [utils.get_stock_price, utils.get_stock_info] * 25
+        with ThreadPoolExecutor(max_workers=50) as pool:
+            list(pool.map(lambda f: f("AAPL"), lookups))
+        self.assertEqual(self.provider.calls["AAPL"], 1)
+
+    def test_concurrent_batch_lookups_share_one_download(self):
+        self.provider.prices["MSFT"] = 20.0
+        with mock.patch.object(self.provider, "latency", 0.3), \
+                ThreadPoolExecutor(max_workers=50) as pool:
+            results = list(pool.map(lambda _: utils.get_multiple_stock_prices(["AAPL", "MSFT"]), range(50)))
+        self.assertEqual(self.provider.calls["AAPL"], 1)
+        self.assertEqual(self.provider.calls["MSFT"], 1)
+        self.assertEqual(results, [{"AAPL": 10.0, "MSFT": 20.0}] * 50)
+
+    def test_batch_waits_only_on_the_symbols_in_flight(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        batches = []
+
+        def download(keys):
+            batches.append(sorted(keys))
+            if "AAPL" in keys:
+                release.wait(1)
+            return {key: key.lower() for key in keys}
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            first = pool.submit(flight.do_many, ["AAPL"], download)
+            time.sleep(0.05)
+            threading.Timer(0.05, release.set).start()
+            second = flight.do_many(["AAPL", "MSFT"], download)
+        self.assertEqual(batches, [["AAPL"], ["MSFT"]])
+        self.assertEqual(second, {"AAPL": "aapl", "MSFT": "msft"})
+        self.assertEqual(first.result(), {"AAPL": "aapl"})
+
+    def test_answer_is_cached_before_the_flight_ends(self):
+        """A caller that missed the cache just before the flight landed doesn't fetch again."""
+        utils.get_stock_price("AAPL")
+        self.assertEqual(utils._load_quote("AAPL")["price"], 10.0)
+        self.assertEqual(self.provider.calls["AAPL"], 1)
+
+    def test_unknown_symbols_are_negative_cached_inside_the_flight(self):
+        self.provider.invalid.add("BOGUS")
+        self.assertIsNone(utils._load_quote("BOGUS")["price"])
+        self.assertIn("error", utils._load_quote("BOGUS"))
+        self.assertEqual(self.provider.calls["BOGUS"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import lazy
+import utils
+from providers import ProviderChain, StubProvider
+from symbol_index import SymbolIndex
+
+
+class TestStartup(unittest.TestCase):
+    def test_importing_main_stays_light(self):
+        """Heavy libraries and data files wait for first use or the background prewarm."""
+        code = (
+            "import sys, main, persistence, utils\n"
+            "print(sorted(m for m in ('yfinance', 'pandas', 'requests') if m in sys.modules))\n"
+            "print(persistence._known_version is None, utils._symbol_index._symbols is None)\n"
+        )
+        env = dict(os.environ, FINSIGHT_BACKGROUND_REFRESH="0")
+        output = subprocess.check_output([sys.executable, "-c", code], text=True, env=env,
+                                         cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(output.splitlines(), ["[]", "True True"])
+
+
+class TestLazyModule(unittest.TestCase):
+    def test_imports_on_first_use_and_patches_the_real_module(self):
+        proxy = lazy.LazyModule("json")
+        import json
+        self.assertIs(lazy.load(proxy), json)
+        with mock.patch.object(proxy, "dumps", return_value="patched"):
+            self.assertEqual(json.dumps({}), "patched")
+        self.assertEqual(proxy.dumps({}), "{}")
+
+
+class TestPrewarm(unittest.TestCase):
+    def test_steps_load_the_symbol_index_and_held_quotes(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        utils.clear_cache()
+        self.addCleanup(utils.clear_cache)
+        index = SymbolIndex(os.path.join(tmpdir.name, "symbols.json"))
+        with mock.patch.object(utils, "_symbol_index", index), \
+                mock.patch.object(utils, "_quote_providers", ProviderChain([StubProvider()])):
+            timings = utils.prewarm(utils.QuoteRefresher(lambda: ["AAPL"]), ["symbols", "quotes"])
+            self.assertIsNotNone(index._symbols)
+            self.assertIsNotNone(utils.get_cached_stock_info("AAPL"))
+        self.assertEqual(set(timings), {"symbols", "quotes"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import lots
+import persistence
+from portfolio import Portfolio
+from storage import JsonStorage, SQLiteStorage
+
+
+class TestSQLiteStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.storage = SQLiteStorage(os.path.join(self.tmpdir.name, "finsight.db"))
+        for name, value in (("validate_ticker", True), ("get_stock_price", 10.0)):
+            patcher = mock.patch(f"portfolio.{name}", return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_portfolios_are_isolated_per_user(self):
+        alice = Portfolio(user="alice", storage=self.storage)
+        bob = Portfolio(user="bob", storage=self.storage)
+        alice.add_investment("AAPL", 100)
+        alice.add_investment("aapl", 50)
+        bob.add_investment("MSFT", 10)
+
+        aapl = Portfolio(user="alice", storage=self.storage).investments["AAPL"]
+        self.assertEqual(aapl["amount_invested"], 150)
+        self.assertEqual(lots.position_shares(aapl), 15)
+        self.assertEqual(list(Portfolio(user="bob", storage=self.storage).investments), ["MSFT"])
+        self.assertEqual(sorted(self.storage.held_tickers()), ["AAPL", "MSFT"])
+
+    def test_remove_only_touches_one_user(self):
+        Portfolio(user="alice", storage=self.storage).add_investment("AAPL", 100)
+        bob = Portfolio(user="bob", storage=self.storage)
+        bob.add_investment("AAPL", 10)
+        bob.remove_investment("AAPL")
+        with self.assertRaises(KeyError):
+            bob.remove_investment("AAPL")
+        self.assertIn("AAPL", Portfolio(user="alice", storage=self.storage).investments)
+
+    def test_concurrent_adds_are_not_lost(self):
+        """Separate Portfolio objects (as in separate workers) increment atomically."""
+        def add(_):
+            Portfolio(user="alice", storage=self.storage).add_investment("AAPL", 1)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(add, range(40)))
+        self.assertEqual(self.storage.load("alice")["AAPL"]["amount_invested"], 40)
+
+    def test_sell_keeps_realized_pl(self):
+        alice = Portfolio(user="alice", storage=self.storage)
+        alice.add_investment("AAPL", 100, shares=10)
+        self.assertAlmostEqual(alice.sell_investment("AAPL", 10, price=12.0), 20.0)
+        stored = self.storage.load("alice")["AAPL"]
+        self.assertEqual(lots.position_shares(stored), 0)
+        self.assertAlmostEqual(stored["realized_pl"], 20.0)
+        with self.assertRaises(ValueError):
+            alice.sell_investment("AAPL", 1, price=12.0)
+
+
+class TestJsonStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        for name, filename in (("DATA_PATH", "portfolio.json"), ("JOURNAL_PATH", "portfolio.journal"),
+                               ("LOCK_PATH", "portfolio.lock")):
+            patcher = mock.patch.object(persistence, name, os.path.join(self.tmpdir.name, filename))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        persistence.save_investments({"AAPL": {"amount_invested": 100.0}})
+        self.storage = JsonStorage()
+
+    def test_load_returns_a_private_copy(self):
+        loaded = self.storage.load(None)
+        loaded["AAPL"]["current_price"] = 12.0
+        loaded["MSFT"] = {"amount_invested": 1.0}
+        self.assertEqual(self.storage.load(None), {"AAPL": {"amount_invested": 100.0}})
+
+    def test_reload_does_not_touch_copies_already_handed_out(self):
+        before = self.storage.load(None)
+        # Another worker process rewrites the files
+        persistence.save_investments({"MSFT": {"amount_invested": 5.0}})
+        with mock.patch("storage.changed_on_disk", return_value=True):
+            self.assertEqual(list(self.storage.load(None)), ["MSFT"])
+        self.assertEqual(list(before), ["AAPL"])
+
+
+if __name__ == "__main__":
+    unittest.main()
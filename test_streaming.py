@@ -0,0 +1,79 @@
+import json
+import time
+import unittest
+from unittest import mock
+
+import streaming
+import utils
+from streaming import QuotePoller, event_stream
+
+
+class TestQuotePoller(unittest.TestCase):
+    def setUp(self):
+        self.prices = {"AAPL": 100.0, "MSFT": 200.0}
+        self.refresh = mock.Mock()
+        # interval is long so only explicit poll_once() calls poll
+        self.poller = QuotePoller(interval=60, refresh=self.refresh, read=self._read)
+
+    def _read(self, tickers):
+        return {t: {"price": self.prices[t]} for t in tickers if t in self.prices}
+
+    def test_one_refresh_for_all_subscribers(self):
+        first = self.poller.subscribe(lambda: ["AAPL"])
+        second = self.poller.subscribe(lambda: ["aapl", "MSFT"])
+        self.refresh.reset_mock()
+        self.poller.poll_once()
+
+        self.refresh.assert_called_once_with(["AAPL", "MSFT"])
+        self.assertEqual(first.wait(0), {"AAPL"})
+        self.assertEqual(second.wait(0), {"AAPL", "MSFT"})
+
+    def test_only_changed_tickers_are_pushed(self):
+        subscription = self.poller.subscribe(lambda: ["AAPL", "MSFT"])
+        self.poller.poll_once()
+        subscription.wait(0)
+
+        self.prices["MSFT"] = 201.0
+        self.assertEqual(self.poller.poll_once(), {"MSFT"})
+        self.assertEqual(subscription.wait(0), {"MSFT"})
+        self.assertEqual(self.poller.poll_once(), set())
+        self.assertEqual(subscription.wait(0), set())
+
+    def test_thread_stops_without_subscribers(self):
+        subscription = self.poller.subscribe(lambda: ["AAPL"])
+        self.poller.unsubscribe(subscription)
+        deadline = time.monotonic() + 2
+        while self.poller._thread is not None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIsNone(self.poller._thread)
+
+
+class TestEventStream(unittest.TestCase):
+    def setUp(self):
+        utils.clear_cache()
+        self.addCleanup(utils.clear_cache)
+
+    def test_update_event_has_changed_rows_and_totals(self):
+        utils._quote_cache.set("AAPL", {"price": 110.0, "prev_close": 100.0, "name": "Apple",
+                                        "fetched_at": time.time()})
+        investments = {"AAPL": {"amount_invested": 100.0}, "MSFT": {"amount_invested": 50.0}}
+        subscription = streaming.Subscription(lambda: list(investments))
+        subscription.push({"AAPL"})
+        closed = []
+        events = event_stream(subscription, lambda: investments, on_close=closed.append, heartbeat=0)
+
+        self.assertTrue(next(events).startswith("retry:"))
+        event = next(events)
+        self.assertTrue(event.startswith("event: update\ndata: "))
+        payload = json.loads(event.split("data: ", 1)[1])
+        self.assertEqual(list(payload["rows"]), ["AAPL"])
+        self.assertEqual(payload["rows"]["AAPL"]["current_price"], 110.0)
+        self.assertEqual(payload["totals"]["current_value"], 110.0)
+        self.assertEqual(next(events), ": keep-alive\n\n")
+
+        events.close()
+        self.assertEqual(closed, [subscription])
+
+
+if __name__ == "__main__":
+    unittest.main()
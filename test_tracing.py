@@ -0,0 +1,91 @@
+import os
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+os.environ.setdefault("FINSIGHT_BACKGROUND_REFRESH", "0")
+
+import tracing
+import utils
+from providers import ProviderChain, StubProvider
+from storage import SQLiteStorage
+
+
+class TestSpans(unittest.TestCase):
+    def test_spans_outside_a_request_are_ignored(self):
+        with tracing.span("quotes"):
+            pass
+        self.assertIs(tracing.bind(len), len)
+
+    def test_spans_add_up_per_name(self):
+        timings, token = tracing.start_request()
+        try:
+            for _ in range(2):
+                with tracing.span("quotes"):
+                    time.sleep(0.01)
+            with tracing.span("render"):
+                pass
+        finally:
+            tracing.finish_request(token)
+
+        total, count = timings.spans["quotes"]
+        self.assertEqual(count, 2)
+        self.assertGreaterEqual(total, 0.02)
+        header = timings.server_timing()
+        self.assertRegex(header, r'^quotes;dur=[\d.]+;desc="2 calls", render;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_bound_calls_on_pool_threads_report_to_the_request(self):
+        def work(_):
+            with tracing.span("provider"):
+                pass
+
+        timings, token = tracing.start_request()
+        try:
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                list(pool.map(tracing.bind(work), range(8)))
+        finally:
+            tracing.finish_request(token)
+        self.assertEqual(timings.spans["provider"][1], 8)
+
+
+class TestRequestTiming(unittest.TestCase):
+    def setUp(self):
+        import main
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        utils.clear_cache()
+        self.addCleanup(utils.clear_cache)
+        storage = SQLiteStorage(os.path.join(self.tmpdir.name, "finsight.db"))
+        storage.import_investments(None, {"AAPL": {"amount_invested": 100.0}})
+        for patcher in (
+            mock.patch.object(utils, "_quote_providers", ProviderChain([StubProvider()])),
+            mock.patch.object(main, "storage", storage),
+            mock.patch.object(tracing, "PROFILE_DIR", os.path.join(self.tmpdir.name, "profiles")),
+            mock.patch.object(tracing, "PROFILE_TOKEN", "secret"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = main.app.test_client()
+
+    def test_dashboard_reports_server_timing(self):
+        response = self.client.get("/")
+        self.assertEqual(response.status_code, 200)
+        names = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+        for name in ("load", "quotes", "provider", "valuation", "render", "total"):
+            self.assertIn(name, names)
+        self.assertNotIn("X-Profile", response.headers)
+
+    def test_profile_token_dumps_one_request(self):
+        response = self.client.get("/?profile=wrong")
+        self.assertNotIn("X-Profile", response.headers)
+
+        response = self.client.get("/?profile=secret")
+        self.assertEqual(response.status_code, 200)
+        dump = os.path.join(tracing.PROFILE_DIR, response.headers["X-Profile"])
+        self.assertTrue(os.path.getsize(dump) > 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import login
+import user_store
+from user_store import SQLiteUserStore, UserExistsError
+
+
+def _account(username, email):
+    return {'username': username, 'first_name': "Ada", 'last_name': "Lovelace", 'dob': "1815-12-10",
+            'email': email, 'password_hash': "x", 'created_at': "2025-01-01 00:00:00"}
+
+
+def _fail_logins_in_subprocess(path, count):
+    store = SQLiteUserStore(path)
+    for _ in range(count):
+        store.record_failed_login("ada", 1000, 60, now=0)
+
+
+class TestSQLiteUserStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "users.db")
+        self.store = SQLiteUserStore(self.path)
+
+    def test_accounts_persist_across_instances(self):
+        self.store.create(_account("ada", "ada@example.com"))
+        user = SQLiteUserStore(self.path).get("ada")
+        self.assertEqual(user['email'], "ada@example.com")
+        self.assertEqual(user['failed_attempts'], 0)
+        self.assertIsNone(user['lockout_until'])
+        self.assertIsNone(self.store.get("bob"))
+
+    def test_username_and_email_are_unique(self):
+        self.store.create(_account("ada", "ada@example.com"))
+        with self.assertRaises(UserExistsError) as raised:
+            self.store.create(_account("ada", "other@example.com"))
+        self.assertEqual(raised.exception.field, "username")
+        with self.assertRaises(UserExistsError) as raised:
+            self.store.create(_account("bob", "ada@example.com"))
+        self.assertEqual(raised.exception.field, "email")
+        self.assertEqual(len(self.store), 1)
+
+    def test_failed_logins_lock_and_expired_lockouts_restart_the_count(self):
+        self.store.create(_account("ada", "ada@example.com"))
+        self.assertEqual(self.store.record_failed_login("ada", 2, 60, now=100), (1, None))
+        self.assertEqual(self.store.record_failed_login("ada", 2, 60, now=100), (2, 160))
+        self.assertEqual(self.store.record_failed_login("ada", 2, 60, now=200), (1, None))
+        self.store.reset_failed_logins("ada")
+        self.assertEqual(self.store.get("ada")['failed_attempts'], 0)
+
+    @unittest.skipIf(os.name != "posix", "needs fork")
+    def test_workers_do_not_lose_failed_attempts(self):
+        self.store.create(_account("ada", "ada@example.com"))
+        ctx = multiprocessing.get_context("fork")
+        workers = [ctx.Process(target=_fail_logins_in_subprocess, args=(self.path, 25)) for _ in range(4)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join(30)
+        self.assertEqual(self.store.get("ada")['failed_attempts'], 100)
+
+
+class TestLoginFlow(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        patcher = mock.patch.object(user_store, "_default_store",
+                                    SQLiteUserStore(os.path.join(self.tmpdir.name, "users.db")))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = login.app.test_client()
+
+    def _register(self, username, email):
+        return self.client.post("/register", data={
+            'first_name': "Ada", 'last_name': "Lovelace", 'dob': "1815-12-10", 'email': email,
+            'username': username, 'password': "Secret1!x", 'confirm_password': "Secret1!x",
+        })
+
+    def test_register_login_and_lockout(self):
+        self.assertIn("/login", self._register("ada", "ada@example.com").location)
+        # A second account with the same email goes back to the form
+        self.assertIn("/register", self._register("bob", "ADA@example.com").location)
+
+        for _ in range(login.MAX_LOGIN_ATTEMPTS):
+            self.client.post("/login", data={'username': "ada", 'password': "wrong"})
+        self.assertIsNotNone(user_store.get_user_store().get("ada")['lockout_until'])
+        response = self.client.post("/login", data={'username': "ada", 'password': "Secret1!x"})
+        self.assertIn("/login", response.location)
+
+        user_store.get_user_store().reset_failed_logins("ada")
+        response = self.client.post("/login", data={'username': "ada", 'password': "Secret1!x"})
+        self.assertTrue(response.location.endswith("/"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,345 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pandas as pd
+
+import utils
+from history_store import HistoryStore
+from providers import build_providers
+from symbol_index import SymbolIndex
+
+
+def setUpModule():
+    # Keep downloaded bars out of the real data directory
+    global _history_dir, _real_history_store, _real_providers
+    _history_dir = tempfile.TemporaryDirectory()
+    _real_history_store = utils._history_store
+    _real_providers = utils._quote_providers
+    utils._history_store = HistoryStore(_history_dir.name, fetch_bars=lambda t, start: None)
+    utils._quote_providers = build_providers("yfinance", history_store=utils._history_store)
+
+
+def tearDownModule():
+    utils._history_store = _real_history_store
+    utils._quote_providers = _real_providers
+    _history_dir.cleanup()
+
+
+def _download_frame(closes):
+    """Build a yf.download(group_by='ticker') style frame from {ticker: [closes]}"""
+    frames = {
+        (ticker, 'Close'): values
+        for ticker, values in closes.items()
+    }
+    days = max(len(values) for values in closes.values())
+    return pd.DataFrame(frames, index=pd.date_range(end=pd.Timestamp.today().normalize(), periods=days))
+
+
+class TestMultipleStockPrices(unittest.TestCase):
+    def setUp(self):
+        utils.clear_cache()
+
+    def tearDown(self):
+        utils.clear_cache()
+
+    def test_batch_fetch_uses_one_download(self):
+        """All uncached tickers are resolved by a single bulk request."""
+        frame = _download_frame({"AAPL": [100.0, 101.5], "MSFT": [300.0, 302.0]})
+        with mock.patch.object(utils.yf, "download", return_value=frame) as download, \
+                mock.patch.object(utils, "get_stock_price") as single:
+            prices = utils.get_multiple_stock_prices(["AAPL", "msft"])
+
+        download.assert_called_once()
+        single.assert_not_called()
+        self.assertEqual(prices, {"AAPL": 101.5, "msft": 302.0})
+        # The bars that came with the download are kept locally
+        self.assertEqual(utils._history_store.previous_close("AAPL"), 100.0)
+
+    def test_failed_symbols_fall_back_to_single_lookup(self):
+        """Only symbols missing from the batch result are fetched individually."""
+        frame = _download_frame({"AAPL": [100.0, 101.5], "INVALID": [float("nan"), float("nan")]})
+        with mock.patch.object(utils.yf, "download", return_value=frame), \
+                mock.patch.object(utils, "get_stock_price",
+                                  side_effect=utils.StockPriceError("nope")) as single:
+            prices = utils.get_multiple_stock_prices(["AAPL", "INVALID"])
+
+        single.assert_called_once_with("INVALID")
+        self.assertEqual(prices, {"AAPL": 101.5, "INVALID": None})
+
+    def test_cached_prices_skip_the_provider(self):
+        utils._quote_cache.set("AAPL", {"price": 99.0})
+        with mock.patch.object(utils.yf, "download") as download:
+            prices = utils.get_multiple_stock_prices(["AAPL"])
+
+        download.assert_not_called()
+        self.assertEqual(prices, {"AAPL": 99.0})
+
+    def test_failed_lookups_are_negative_cached(self):
+        with mock.patch.object(utils, "_fetch_quote", return_value=None) as fetch:
+            for _ in range(3):
+                with self.assertRaises(utils.StockPriceError):
+                    utils.get_stock_price("INVALID")
+        fetch.assert_called_once()
+
+
+class TestIterStockPrices(unittest.TestCase):
+    def setUp(self):
+        utils.clear_cache()
+        self.addCleanup(utils.clear_cache)
+
+    def test_cached_prices_come_before_fetches(self):
+        utils._quote_cache.set("MSFT", {"price": 300.0})
+
+        def slow_batch(symbols):
+            time.sleep(0.2)
+            return {s: {"price": 1.0, "fetched_at": time.time()} for s in symbols}
+
+        with mock.patch.object(utils, "_fetch_quotes_batch", side_effect=slow_batch):
+            started = time.monotonic()
+            prices = utils.iter_stock_prices(["AAPL", "MSFT", "aapl"])
+            self.assertEqual(next(prices), ("MSFT", 300.0))
+            self.assertLess(time.monotonic() - started, 0.1)
+            self.assertEqual(list(prices), [("AAPL", 1.0), ("aapl", 1.0)])
+
+    def test_large_requests_are_split_into_batches(self):
+        symbols = [f"T{i}" for i in range(5)]
+        with mock.patch.object(utils, "FETCH_BATCH_SIZE", 2), \
+                mock.patch.object(utils, "_fetch_quotes_batch",
+                                  side_effect=lambda batch: {s: {"price": 1.0} for s in batch}) as download:
+            prices = dict(utils.iter_stock_prices(symbols))
+        self.assertEqual(download.call_count, 3)
+        self.assertEqual(prices, dict.fromkeys(symbols, 1.0))
+
+    def test_individual_lookups_keep_the_ticker_timeout(self):
+        def lookup(symbol):
+            if symbol == "SLOW":
+                time.sleep(1)
+            return 2.0
+
+        with mock.patch.object(utils, "_fetch_quotes_batch", return_value={}), \
+                mock.patch.object(utils, "get_stock_price", side_effect=lookup), \
+                mock.patch.object(utils, "FETCH_TICKER_TIMEOUT", 0.1):
+            started = time.monotonic()
+            prices = dict(utils.iter_stock_prices(["AAPL", "SLOW"]))
+        self.assertLess(time.monotonic() - started, 0.8)
+        self.assertEqual(prices, {"AAPL": 2.0, "SLOW": None})
+
+    def test_no_lookups_are_started_after_the_deadline(self):
+        def slow_batch(symbols):
+            time.sleep(0.3)
+            return {}
+
+        with mock.patch.object(utils, "_fetch_quotes_batch", side_effect=slow_batch), \
+                mock.patch.object(utils, "get_stock_price") as lookup, \
+                mock.patch.object(utils, "_stale_price", return_value=5.0), \
+                mock.patch.object(utils, "FETCH_DEADLINE", 0.1):
+            prices = dict(utils.iter_stock_prices(["AAPL"]))
+        self.assertEqual(prices, {"AAPL": 5.0})
+        lookup.assert_not_called()
+
+
+class TestStockInfo(unittest.TestCase):
+    def setUp(self):
+        utils.clear_cache()
+
+    def tearDown(self):
+        utils.clear_cache()
+
+    def test_stock_info_is_served_from_cache(self):
+        record = {"price": 110.0, "prev_close": 100.0, "name": "Apple Inc.",
+                  "currency": "USD", "fetched_at": time.time()}
+        with mock.patch.object(utils, "_fetch_quote", return_value=record) as fetch:
+            info = utils.get_stock_info("aapl")
+            self.assertEqual(utils.get_stock_price("AAPL"), 110.0)
+            self.assertEqual(utils.get_stock_info("AAPL"), info)
+
+        fetch.assert_called_once_with("AAPL")
+        self.assertEqual(info["change"], 10.0)
+        self.assertEqual(info["change_percent"], 10.0)
+        self.assertEqual(info["name"], "Apple Inc.")
+
+
+class TestStaleWhileRevalidate(unittest.TestCase):
+    def setUp(self):
+        utils.clear_cache()
+
+    def tearDown(self):
+        utils.clear_cache()
+
+    def _expired(self, price, age):
+        utils._quote_cache.set("AAPL", {"price": price, "name": "Apple", "fetched_at": time.time() - age}, ttl=0)
+
+    def test_recently_expired_quote_is_served_while_refreshing(self):
+        self._expired(100.0, age=400)
+        with mock.patch.object(utils, "_schedule_refresh") as refresh, \
+                mock.patch.object(utils, "_fetch_quote") as fetch:
+            self.assertEqual(utils.get_stock_price("AAPL"), 100.0)
+        refresh.assert_called_once_with(["AAPL"], full=False)
+        fetch.assert_not_called()
+
+    def test_stale_prices_are_revalidated_with_one_batch(self):
+        symbols = [f"T{i}" for i in range(20)]
+        for symbol in symbols:
+            utils._quote_cache.set(symbol, {"price": 1.0, "fetched_at": time.time() - 400}, ttl=0)
+        refreshed = threading.Event()
+        with mock.patch.object(utils, "_fetch_quotes_batch",
+                               side_effect=lambda batch: refreshed.set() or {s: {"price": 2.0} for s in batch}) \
+                as download, mock.patch.object(utils, "_fetch_quote") as single:
+            self.assertEqual(utils.get_multiple_stock_prices(symbols), dict.fromkeys(symbols, 1.0))
+            self.assertTrue(refreshed.wait(2))
+            deadline = time.monotonic() + 2
+            while utils._refreshing and time.monotonic() < deadline:
+                time.sleep(0.01)
+        download.assert_called_once_with(sorted(symbols))
+        single.assert_not_called()
+        self.assertEqual(utils.get_multiple_stock_prices(symbols), dict.fromkeys(symbols, 2.0))
+
+    def test_quote_past_max_staleness_blocks(self):
+        self._expired(100.0, age=utils.QUOTE_MAX_STALENESS + 1)
+        record = {"price": 120.0, "name": "Apple", "fetched_at": time.time()}
+        with mock.patch.object(utils, "_fetch_quote", return_value=record) as fetch:
+            self.assertEqual(utils.get_stock_price("AAPL"), 120.0)
+        fetch.assert_called_once_with("AAPL")
+
+    def test_last_good_quote_is_served_when_providers_are_down(self):
+        self._expired(100.0, age=utils.QUOTE_MAX_STALENESS + 1)
+        with mock.patch.object(utils, "_fetch_quote", return_value=None):
+            self.assertEqual(utils.get_stock_price("AAPL"), 100.0)
+            with self.assertRaises(utils.StockPriceError):
+                utils.get_stock_price("MSFT")
+
+    def test_refresher_batches_known_tickers(self):
+        utils._quote_cache.set("AAPL", {"price": 1.0, "name": "Apple", "fetched_at": time.time()})
+        batch = {"AAPL": {"price": 2.0, "prev_close": 1.5, "fetched_at": time.time()}}
+        with mock.patch.object(utils, "_fetch_quotes_batch", return_value=batch) as download:
+            utils.QuoteRefresher(lambda: ["aapl"]).run_once()
+        download.assert_called_once_with(["AAPL"])
+        self.assertEqual(utils.get_stock_info("AAPL")["price"], 2.0)
+        self.assertEqual(utils.get_stock_info("AAPL")["name"], "Apple")
+
+
+class TestValidateTicker(unittest.TestCase):
+    def setUp(self):
+        utils.clear_cache()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "symbols.json")
+        patcher = mock.patch.object(utils, "_symbol_index", SymbolIndex(self.path, save_delay=0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmpdir.cleanup)
+        self.addCleanup(utils.clear_cache)
+
+    def test_outcomes_are_persisted_and_reused(self):
+        def fetch(ticker):
+            return {"price": 10.0 if ticker == "AAPL" else None, "fetched_at": time.time()}
+
+        with mock.patch.object(utils, "_fetch_quote", side_effect=fetch) as provider:
+            self.assertTrue(utils.validate_ticker("aapl"))
+            self.assertFalse(utils.validate_ticker("INVALID"))
+            self.assertTrue(utils.validate_ticker("AAPL"))
+            self.assertFalse(utils.validate_ticker("INVALID"))
+        self.assertEqual(provider.call_count, 2)
+
+        # A fresh process loads the answers from disk
+        reloaded = SymbolIndex(self.path)
+        self.assertTrue(reloaded.lookup("AAPL"))
+        self.assertFalse(reloaded.lookup("INVALID"))
+
+    def test_provider_errors_are_not_recorded(self):
+        with mock.patch.object(utils, "_fetch_quote", return_value=None):
+            self.assertFalse(utils.validate_ticker("AAPL"))
+        self.assertIsNone(utils._symbol_index.lookup("AAPL"))
+
+    def test_symbols_the_provider_raises_for_are_recorded_invalid(self):
+        missing = utils.yf.exceptions.YFTickerMissingError("BOGUS", "no such symbol")
+        with mock.patch.object(utils.yf, "Ticker", side_effect=missing):
+            self.assertFalse(utils.validate_ticker("BOGUS"))
+        self.assertFalse(utils._symbol_index.lookup("BOGUS"))
+
+    def test_expired_answers_are_revalidated(self):
+        index = SymbolIndex(self.path, invalid_ttl=0, save_delay=0)
+        index.record("NEWIPO", False)
+        self.assertIsNone(index.lookup("NEWIPO"))
+
+    def test_answers_are_saved_together(self):
+        index = SymbolIndex(self.path, save_delay=60)
+        with mock.patch.object(index, "_save", wraps=index._save) as save:
+            for ticker in ("AAPL", "MSFT", "GOOGL"):
+                index.record(ticker, True)
+            self.assertFalse(os.path.exists(self.path))
+            index.flush()
+            index.flush()
+        save.assert_called_once()
+        self.assertEqual(len(SymbolIndex(self.path)), 3)
+
+    def test_pending_answers_are_saved_after_the_delay(self):
+        index = SymbolIndex(self.path, save_delay=0.05)
+        index.record("AAPL", True)
+        time.sleep(0.3)
+        self.assertTrue(SymbolIndex(self.path).lookup("AAPL"))
+
+
+class TestFetchConcurrently(unittest.TestCase):
+    def test_slow_ticker_does_not_block_the_rest(self):
+        """A ticker past its timeout is reported stale/missing while others succeed."""
+        def fetch(ticker):
+            if ticker == "SLOW":
+                time.sleep(1)
+            return ticker.lower()
+
+        started = time.monotonic()
+        results = utils.fetch_concurrently(
+            fetch, ["AAPL", "SLOW", "MSFT"], ticker_timeout=0.1, deadline=5
+        )
+        self.assertLess(time.monotonic() - started, 0.8)
+        self.assertEqual(results["AAPL"].value, "aapl")
+        self.assertEqual(results["MSFT"].status, utils.FetchResult.OK)
+        self.assertEqual(results["SLOW"].status, utils.FetchResult.MISSING)
+
+    def test_deadline_returns_stale_values(self):
+        results = utils.fetch_concurrently(
+            lambda t: time.sleep(1), ["AAPL"], ticker_timeout=5, deadline=0.1,
+            fallback=lambda t: 42.0
+        )
+        self.assertEqual(results["AAPL"].status, utils.FetchResult.STALE)
+        self.assertEqual(results["AAPL"].value, 42.0)
+
+    def test_errors_are_captured_per_ticker(self):
+        def fetch(ticker):
+            raise utils.StockPriceError(f"bad {ticker}")
+
+        results = utils.fetch_concurrently(fetch, ["X"])
+        self.assertEqual(results["X"].status, utils.FetchResult.ERROR)
+        self.assertIn("bad X", results["X"].error)
+
+    def test_closing_early_cancels_queued_calls(self):
+        release = threading.Event()
+        calls = []
+
+        def fetch(ticker):
+            calls.append(ticker)
+            if ticker == "B":
+                release.wait(5)
+            return ticker
+
+        pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown)
+        self.addCleanup(release.set)
+        with mock.patch.object(utils, "_get_fetch_executor", return_value=pool):
+            results = utils.iter_concurrently(fetch, ["A", "B", "C"], max_workers=2, ticker_timeout=0.1, deadline=5)
+            self.assertEqual(next(results).ticker, "A")
+            # B is abandoned after its timeout while C waits behind it on the pool
+            self.assertEqual(next(results).status, utils.FetchResult.MISSING)
+            results.close()
+        release.set()
+        pool.shutdown(wait=True)
+        self.assertEqual(calls, ["A", "B"])
+
+
+if __name__ == "__main__":
+    unittest.main()
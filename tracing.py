@@ -0,0 +1,132 @@
+import contextvars
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Share of requests profiled with cProfile, e.g. 0.001; 0 turns sampling off
+PROFILE_RATE = float(os.environ.get("FINSIGHT_PROFILE_RATE", 0))
+# Secret that profiles a single request when passed as ?profile=<token>; unset disables the flag
+PROFILE_TOKEN = os.environ.get("FINSIGHT_PROFILE_TOKEN")
+# Where .prof dumps go; open them with pstats or snakeviz
+PROFILE_DIR = os.environ.get("FINSIGHT_PROFILE_DIR", "data/profiles")
+
+_current = contextvars.ContextVar("finsight_timings", default=None)
+# cProfile can't run two profilers at once, so one request is profiled at a time
+_profile_lock = threading.Lock()
+
+
+class Timings:
+    """Total seconds and call count per span name for one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        # Worker threads running bound calls report here too
+        with self._lock:
+            total, count = self.spans.get(name, (0.0, 0))
+            self.spans[name] = (total + seconds, count + 1)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Server-Timing header value: one entry per span plus the total so far, in milliseconds"""
+        with self._lock:
+            spans = list(self.spans.items())
+        entries = []
+        for name, (total, count) in spans:
+            entry = f"{name};dur={total * 1000:.1f}"
+            if count > 1:
+                # Spans from worker threads overlap, so their sum can exceed the total
+                entry += f';desc="{count} calls"'
+            entries.append(entry)
+        entries.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(entries)
+
+
+def start_request():
+    """Collect spans for the current request until finish_request()"""
+    timings = Timings()
+    token = _current.set(timings)
+    return timings, token
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+@contextmanager
+def span(name):
+    """Add the time spent in the with block to the current request's span name; free outside a request"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def bind(func):
+    """func wrapped so spans it records on pool threads count towards the caller's request"""
+    timings = _current.get()
+    if timings is None:
+        return func
+
+    def run(*args, **kwargs):
+        token = _current.set(timings)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+
+class RequestProfiler:
+    """cProfile for one request, dumped to PROFILE_DIR as <time>-<label>.prof"""
+
+    def __init__(self):
+        self._profile = None
+
+    def start(self):
+        """Begin profiling; False if another request is already being profiled"""
+        if not _profile_lock.acquire(blocking=False):
+            return False
+        self._profile = cProfile.Profile()
+        try:
+            self._profile.enable()
+        except ValueError:
+            # Some other profiler (a debugger, coverage) owns the hook
+            self._profile = None
+            _profile_lock.release()
+            return False
+        return True
+
+    def stop(self, label):
+        """Stop profiling and write the dump; returns its path"""
+        try:
+            self._profile.disable()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", label).strip("_") or "request"
+            path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{safe}.prof")
+            self._profile.dump_stats(path)
+            return path
+        finally:
+            self._profile = None
+            _profile_lock.release()
+
+
+def should_profile(flag=None):
+    """True for a request carrying the profile token, or by sampling at PROFILE_RATE"""
+    if PROFILE_TOKEN and flag == PROFILE_TOKEN:
+        return True
+    return PROFILE_RATE > 0 and random.random() < PROFILE_RATE
@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import threading
+
+from connections import SQLiteConnections
+
+# SQLite file with the login accounts, shared by every worker process on the host
+USERS_PATH = os.environ.get("FINSIGHT_USERS_PATH", "data/users.db")
+
+FIELDS = ("username", "first_name", "last_name", "dob", "email", "password_hash", "created_at",
+          "failed_attempts", "lockout_until")
+
+
+class UserExistsError(ValueError):
+    """The username or email of a new account is already taken; field says which"""
+
+    def __init__(self, field):
+        super().__init__(f"{field} already registered")
+        self.field = field
+
+
+class SQLiteUserStore:
+    """
+    Login accounts in SQLite, with unique indexes on username and email.
+
+    Lookups by username and the email uniqueness check are index probes, so
+    signup and login cost the same however many accounts there are. Lockout
+    state lives in the same row and failed attempts are counted inside an
+    immediate transaction, so workers can't lose each other's increments.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL,
+            dob TEXT NOT NULL,
+            email TEXT NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            failed_attempts INTEGER NOT NULL DEFAULT 0,
+            lockout_until REAL
+        ) WITHOUT ROWID;
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email ON users (email);
+    """
+
+    def __init__(self, path=USERS_PATH, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._connections = SQLiteConnections(path, busy_timeout)
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self):
+        return self._connections.get()
+
+    def get(self, username):
+        """The account as a dict, or None if there is no such user"""
+        row = self._connection().execute(
+            f"SELECT {', '.join(FIELDS)} FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        return dict(zip(FIELDS, row)) if row else None
+
+    def create(self, user):
+        """Add an account; raises UserExistsError if its username or email is taken"""
+        record = dict(user, failed_attempts=user.get('failed_attempts', 0),
+                      lockout_until=user.get('lockout_until'))
+        try:
+            self._connection().execute(
+                f"INSERT INTO users ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})",
+                tuple(record[field] for field in FIELDS)
+            )
+        except sqlite3.IntegrityError as e:
+            # The unique indexes decide, so two workers can't both claim the same name
+            raise UserExistsError("email" if "email" in str(e) else "username") from None
+
+    def record_failed_login(self, username, max_attempts, lockout_duration, now):
+        """Count a failed login and lock the account once it reaches max_attempts;
+        an expired lockout starts a fresh count. Returns (failed_attempts, lockout_until)"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT failed_attempts, lockout_until FROM users WHERE username = ?", (username,)
+            ).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return 0, None
+            attempts, lockout_until = row
+            if lockout_until is not None and lockout_until <= now:
+                attempts, lockout_until = 0, None
+            attempts += 1
+            if attempts >= max_attempts:
+                lockout_until = now + lockout_duration
+            conn.execute(
+                "UPDATE users SET failed_attempts = ?, lockout_until = ? WHERE username = ?",
+                (attempts, lockout_until, username)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return attempts, lockout_until
+
+    def reset_failed_logins(self, username):
+        self._connection().execute(
+            "UPDATE users SET failed_attempts = 0, lockout_until = NULL WHERE username = ?", (username,)
+        )
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_user_store():
+    """The process-wide user store, opened on first use"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = SQLiteUserStore()
+        return _default_store
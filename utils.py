@@ -1,182 +1,694 @@
-import yfinance as yf
-import requests
 from datetime import datetime, timedelta
+import atexit
 import time
 import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED, TimeoutError as FuturesTimeout
+from quote_cache import QuoteCache, DiskQuoteCache
+from symbol_index import SymbolIndex
+from history_store import HistoryStore, bars_from_frame
+from providers import build_providers, get_session, CircuitBreaker, yf
+from singleflight import SingleFlight
+import lazy
+from market_calendar import MarketCalendar
+from metrics import REGISTRY
+import tracing
 
-# Cache to store recent price lookups
-_price_cache = {}
+# Cache to store recent quote lookups (price, prev close, name, currency)
 _cache_duration = 300  # 5 minutes in seconds
+_negative_cache_duration = 60  # failed lookups are retried after a minute
+# Optional SQLite file shared by every worker on the host and kept across restarts
+QUOTE_DISK_CACHE_PATH = os.environ.get("FINSIGHT_QUOTE_DISK_CACHE")
+_quote_cache = QuoteCache(
+    max_entries=int(os.environ.get("FINSIGHT_QUOTE_CACHE_SIZE", 2048)),
+    ttl=_cache_duration,
+    negative_ttl=_negative_cache_duration,
+    backing=DiskQuoteCache(QUOTE_DISK_CACHE_PATH) if QUOTE_DISK_CACHE_PATH else None
+)
+
+# Known-valid/invalid tickers, loaded once at startup; answers still waiting to be saved are written at exit
+_symbol_index = SymbolIndex()
+atexit.register(_symbol_index.flush)
+
+# Exchange sessions and holidays, worked out locally
+_market_calendar = MarketCalendar()
+
+# Concurrent fetch settings
+FETCH_MAX_WORKERS = int(os.environ.get("FINSIGHT_FETCH_WORKERS", 8))
+FETCH_TICKER_TIMEOUT = float(os.environ.get("FINSIGHT_FETCH_TICKER_TIMEOUT", 10))  # seconds per ticker
+FETCH_DEADLINE = float(os.environ.get("FINSIGHT_FETCH_DEADLINE", 15))  # seconds for the whole request
+# Tickers per bulk download; larger requests run several downloads side by side
+FETCH_BATCH_SIZE = int(os.environ.get("FINSIGHT_FETCH_BATCH_SIZE", 100))
+
+# Stale-while-revalidate: expired quotes younger than this are served immediately
+# while a refresh runs in the background; older ones make the request wait
+QUOTE_MAX_STALENESS = float(os.environ.get("FINSIGHT_QUOTE_MAX_STALENESS", 900))  # seconds since fetch
+REFRESH_INTERVAL = float(os.environ.get("FINSIGHT_REFRESH_INTERVAL", _cache_duration * 0.8))
+# Loaded in the background as soon as a worker starts, in this order (see prewarm); empty for none
+PREWARM_STEPS = [s.strip() for s in os.environ.get("FINSIGHT_PREWARM", "provider,symbols,quotes").split(",")
+                 if s.strip()]
+
+_fetch_executor = None
+_fetch_executor_lock = threading.Lock()
+_refreshing = set()
+_refreshing_lock = threading.Lock()
 
 class StockPriceError(Exception):
     pass
 
+class FetchResult:
+    """Outcome of one ticker in a fetch_concurrently call"""
+    OK = "ok"
+    STALE = "stale"
+    MISSING = "missing"
+    ERROR = "error"
+
+    __slots__ = ("ticker", "status", "value", "error")
+
+    def __init__(self, ticker, status, value=None, error=None):
+        self.ticker = ticker
+        self.status = status
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.status == FetchResult.OK
+
+    def __repr__(self):
+        return f"FetchResult({self.ticker!r}, {self.status!r}, value={self.value!r})"
+
+def _get_fetch_executor():
+    """Shared worker pool for provider calls, created on first use"""
+    global _fetch_executor
+    if _fetch_executor is None:
+        with _fetch_executor_lock:
+            if _fetch_executor is None:
+                _fetch_executor = ThreadPoolExecutor(
+                    max_workers=FETCH_MAX_WORKERS,
+                    thread_name_prefix="finsight-fetch"
+                )
+    return _fetch_executor
+
+def fetch_concurrently(func, tickers, max_workers=None, ticker_timeout=None, deadline=None, fallback=None):
+    """
+    Run func(ticker) for every ticker on the shared pool; {ticker: FetchResult}.
+
+    At most max_workers calls are in flight for this request. A ticker that runs
+    longer than ticker_timeout, or is still pending when the overall deadline
+    passes, is abandoned: fallback(ticker) is asked for a stale value and the
+    result is marked STALE, or MISSING when there is none. Abandoned calls keep
+    running in the background but nobody waits on them.
+    """
+    return {result.ticker: result for result in
+            iter_concurrently(func, tickers, max_workers, ticker_timeout, deadline, fallback)}
+
+def iter_concurrently(func, tickers, max_workers=None, ticker_timeout=None, deadline=None, fallback=None):
+    """
+    Same as fetch_concurrently, but yields each FetchResult as soon as it is known.
+
+    Nothing is submitted once the deadline has passed, and calls still queued
+    on the pool are cancelled if the caller stops iterating early (e.g. a
+    streaming client went away).
+    """
+    max_workers = max(1, min(max_workers or FETCH_MAX_WORKERS, FETCH_MAX_WORKERS))
+    ticker_timeout = FETCH_TICKER_TIMEOUT if ticker_timeout is None else ticker_timeout
+    deadline = FETCH_DEADLINE if deadline is None else deadline
+
+    executor = _get_fetch_executor()
+    queue = list(dict.fromkeys(tickers))
+    running = {}
+    started = {}
+    end = time.monotonic() + deadline
+
+    @tracing.bind
+    def run(ticker):
+        started[ticker] = time.monotonic()
+        return func(ticker)
+
+    def give_up(ticker, reason):
+        stale = fallback(ticker) if fallback else None
+        if stale is not None:
+            return FetchResult(ticker, FetchResult.STALE, stale, reason)
+        return FetchResult(ticker, FetchResult.MISSING, error=reason)
+
+    try:
+        while queue or running:
+            now = time.monotonic()
+            if now >= end:
+                break
+            while queue and len(running) < max_workers:
+                ticker = queue.pop(0)
+                running[executor.submit(run, ticker)] = ticker
+
+            wake = end
+            for ticker in running.values():
+                # A call that hasn't started yet is checked again within one timeout
+                wake = min(wake, started.get(ticker, now) + ticker_timeout)
+
+            done, _ = wait(list(running), timeout=max(0, wake - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                ticker = running.pop(future)
+                try:
+                    result = FetchResult(ticker, FetchResult.OK, future.result())
+                except Exception as e:
+                    result = FetchResult(ticker, FetchResult.ERROR, error=str(e))
+                yield result
+
+            now = time.monotonic()
+            for future, ticker in list(running.items()):
+                if ticker in started and now - started[ticker] >= ticker_timeout:
+                    del running[future]
+                    yield give_up(ticker, f"Timed out after {ticker_timeout:g}s fetching {ticker}")
+
+        for future, ticker in list(running.items()):
+            del running[future]
+            future.cancel()
+            yield give_up(ticker, f"Deadline exceeded fetching {ticker}")
+        while queue:
+            ticker = queue.pop(0)
+            yield give_up(ticker, f"Deadline exceeded fetching {ticker}")
+    finally:
+        # Only reached with calls outstanding when the caller closed us early
+        for future in running:
+            future.cancel()
+
 def get_stock_price(ticker):
 
     ticker = ticker.upper().strip()
     
-    # Check cache first
-    if _is_price_cached(ticker):
-        return _price_cache[ticker]['price']
-    
     try:
-        # yfinance (primary)
-        price = _fetch_price_yfinance(ticker)
-        if price:
-            _cache_price(ticker, price)
-            return price
-            
-        # Alpha Vantage fallback 
-        # price = _fetch_price_alpha_vantage(ticker)
-        # if price:
-        #     _cache_price(ticker, price)
-        #     return price
-            
-        raise StockPriceError(f"Unable to fetch price for {ticker}")
-        
-    except Exception as e:
+        return _get_quote(ticker)['price']
+    except StockPriceError as e:
         raise StockPriceError(f"Error fetching price for {ticker}: {str(e)}")
 
 def get_multiple_stock_prices(tickers):
+    """{ticker: price or None} for every ticker, see iter_stock_prices"""
+    with tracing.span("quotes"):
+        return dict(iter_stock_prices(tickers))
+
+def iter_stock_prices(tickers):
+    """
+    Yield (ticker, price) as each ticker resolves; price is None if it could not be priced.
 
-    prices = {}
+    Cached quotes come first without any waiting, including recently expired
+    ones, which are revalidated together in the background. Everything else is fetched
+    in batches of FETCH_BATCH_SIZE running side by side, each yielded as soon
+    as its batch returns; symbols a batch could not resolve are then looked
+    up individually, in completion order. The whole call is bounded by
+    FETCH_DEADLINE, after which remaining tickers get their stale price or None.
+    """
+    ready = []
+    stale_symbols = []
+    pending = {}
     for ticker in tickers:
+        symbol = ticker.upper().strip()
+        cached = _quote_cache.get(symbol)
+        if cached is not None:
+            # Negative-cached symbols resolve to None without another lookup
+            ready.append((ticker, cached.get('price')))
+            continue
+        stale = _servable_stale_record(symbol)
+        if stale is not None:
+            stale_symbols.append(symbol)
+            ready.append((ticker, stale['price']))
+            continue
+        # Requested spellings per symbol, so "aapl" and "AAPL" share one lookup
+        pending.setdefault(symbol, []).append(ticker)
+
+    # Every stale symbol is revalidated by one batched download in the background
+    _schedule_refresh(stale_symbols)
+    yield from ready
+    if not pending:
+        return
+
+    deadline = time.monotonic() + FETCH_DEADLINE
+    executor = _get_fetch_executor()
+    symbols = sorted(pending)
+
+    def fetch_batch(batch):
+        # Symbols another request is already downloading are waited on, not fetched twice
+        return _inflight_batches.do_many(batch, _fetch_batch_into_cache,
+                                         timeout=max(0, deadline - time.monotonic()))
+
+    batches = {
+        executor.submit(tracing.bind(fetch_batch), symbols[i:i + FETCH_BATCH_SIZE]): symbols[i:i + FETCH_BATCH_SIZE]
+        for i in range(0, len(symbols), FETCH_BATCH_SIZE)
+    }
+    lookups = None
+
+    try:
+        failed = []
         try:
-            prices[ticker] = get_stock_price(ticker)
-        except StockPriceError as e:
-            print(f"Warning: {e}")
-            prices[ticker] = None
-    
-    return prices
+            for future in as_completed(batches, timeout=max(0, deadline - time.monotonic())):
+                batch = batches.pop(future)
+                try:
+                    fetched = future.result()
+                except Exception as e:
+                    print(f"Warning: batch price fetch failed: {e!r}")
+                    fetched = {}
+                for symbol in batch:
+                    price = (fetched.get(symbol) or {}).get('price')
+                    if not price:
+                        failed.append(symbol)
+                        continue
+                    for ticker in pending[symbol]:
+                        yield ticker, price
+        except FuturesTimeout:
+            print(f"Warning: batch price fetch missed the deadline for {sum(map(len, batches.values()))} tickers")
+            for future, batch in batches.items():
+                future.cancel()
+                failed.extend(batch)
+            batches.clear()
+
+        # Only symbols the batches could not resolve pay for an individual lookup,
+        # under the same per-request worker cap and per-ticker timeout as any other fetch
+        lookups = iter_concurrently(get_stock_price, failed, deadline=max(0, deadline - time.monotonic()),
+                                    fallback=_stale_price)
+        for result in lookups:
+            if result.status == FetchResult.ERROR:
+                print(f"Warning: {result.error}")
+            elif result.status == FetchResult.STALE:
+                print(f"Warning: serving stale price for {result.ticker}: {result.error}")
+            for ticker in pending[result.ticker]:
+                yield ticker, result.value
+    finally:
+        # The caller may stop early (an NDJSON client disconnecting): drop queued work
+        for future in batches:
+            future.cancel()
+        if lookups is not None:
+            lookups.close()
 
 def validate_ticker(ticker):
-    try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
-        return 'regularMarketPrice' in info or 'currentPrice' in info
-    except:
+    ticker = ticker.upper().strip()
+
+    known = _symbol_index.lookup(ticker)
+    if known is not None:
+        return known
+
+    cached = _quote_cache.get(ticker)
+    if cached is not None and cached.get('price'):
+        _symbol_index.record(ticker, True)
+        return True
+
+    record = _load_quote(ticker)
+    if record is None or 'error' in record:
+        # Provider error, or a negative-cached lookup we can't tell apart from one:
+        # don't remember anything, just refuse this time
         return False
 
+    valid = bool(record.get('price'))
+    _symbol_index.record(ticker, valid)
+    return valid
+
 def get_stock_info(ticker):
+    ticker = ticker.upper().strip()
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
-        hist = stock.history(period="2d")
-        
-        current_price = info.get('regularMarketPrice') or info.get('currentPrice')
-        if not current_price and not hist.empty:
-            current_price = hist['Close'].iloc[-1]
-        
-        prev_close = info.get('regularMarketPreviousClose')
-        if not prev_close and len(hist) >= 2:
-            prev_close = hist['Close'].iloc[-2]
-        
-        change = current_price - prev_close if current_price and prev_close else 0
-        change_percent = (change / prev_close * 100) if prev_close else 0
-        
-        return {
-            'ticker': ticker.upper(),
-            'name': info.get('longName', ticker.upper()),
-            'price': round(current_price, 2) if current_price else None,
-            'change': round(change, 2),
-            'change_percent': round(change_percent, 2),
-            'currency': info.get('currency', 'USD'),
-            'last_updated': datetime.now().isoformat()
-        }
-    except Exception as e:
+        return _build_stock_info(ticker, _get_quote(ticker, full=True))
+    except StockPriceError as e:
         raise StockPriceError(f"Error fetching info for {ticker}: {str(e)}")
 
-def _fetch_price_yfinance(ticker):
-    """Fetch price using yfinance library"""
-    try:
-        stock = yf.Ticker(ticker)
-        
-        # Try getting current price from info
-        info = stock.info
-        price = info.get('regularMarketPrice') or info.get('currentPrice')
-        
-        if price:
-            return float(price)
-        
-        # Fallback: get latest price from history
-        hist = stock.history(period="1d")
-        if not hist.empty:
-            return float(hist['Close'].iloc[-1])
-            
-        return None
-        
-    except Exception as e:
-        print(f"yfinance error for {ticker}: {e}")
+def get_cached_stock_info(ticker):
+    """Stock info from the last cached quote, even if expired; None if never fetched"""
+    ticker = ticker.upper().strip()
+    record = _quote_cache.peek(ticker)
+    if not record or not record.get('price'):
         return None
+    info = _build_stock_info(ticker, record)
+    info['stale'] = True
+    return info
 
-def _fetch_price_alpha_vantage(ticker, api_key=None):
+def get_cached_quotes(tickers):
+    """Stock info for each ticker with a cached quote, without calling a provider.
 
-    if not api_key:
-        return None
-    
-    try:
-        url = f"https://www.alphavantage.co/query"
-        params = {
-            'function': 'GLOBAL_QUOTE',
-            'symbol': ticker,
-            'apikey': api_key
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()
-        
-        if 'Global Quote' in data:
-            price = data['Global Quote']['05. price']
-            return float(price)
-            
+    'stale' marks quotes fetched longer ago than the cache TTL.
+    """
+    now = time.time()
+    quotes = {}
+    for ticker in tickers:
+        symbol = ticker.upper().strip()
+        record = _quote_cache.peek(symbol)
+        if not record or not record.get('price'):
+            continue
+        info = _build_stock_info(symbol, record)
+        info['stale'] = now - (record.get('fetched_at') or 0) > _cache_duration
+        quotes[ticker] = info
+    return quotes
+
+def quote_versions(tickers, full=False):
+    """
+    {symbol: version} if every ticker has a fresh cached answer, else None.
+
+    The version is the quote's fetched_at, or ["error", stored_at] for a symbol
+    that is negative-cached, so one bad symbol doesn't stop the rest of the
+    response from being tagged. Equal results mean a price lookup would be
+    answered from the same cached records without calling a provider.
+    full=True also requires the name and currency get_stock_info needs.
+    """
+    now = time.time()
+    versions = {}
+    for ticker in tickers:
+        symbol = ticker.upper().strip()
+        failed_at = _quote_cache.failed_at(symbol)
+        if failed_at is not None:
+            # Answered as unpriced without a provider call until the entry expires
+            versions[symbol] = ["error", failed_at]
+            continue
+        record = _quote_cache.peek(symbol)
+        if not record or not record.get('price') or (full and 'name' not in record):
+            return None
+        fetched_at = record.get('fetched_at')
+        if fetched_at is None or now - fetched_at >= _quote_cache.ttl:
+            return None
+        versions[symbol] = fetched_at
+    return versions
+
+def _build_stock_info(ticker, record):
+    """Shape a cached quote record into the get_stock_info response"""
+    current_price = record.get('price')
+    prev_close = record.get('prev_close')
+
+    change = current_price - prev_close if current_price and prev_close else 0
+    change_percent = (change / prev_close * 100) if prev_close else 0
+
+    fetched_at = record.get('fetched_at')
+    return {
+        'ticker': ticker,
+        'name': record.get('name', ticker),
+        'price': round(current_price, 2) if current_price else None,
+        'prev_close': round(prev_close, 2) if prev_close else None,
+        'change': round(change, 2),
+        'change_percent': round(change_percent, 2),
+        'currency': record.get('currency', 'USD'),
+        'last_updated': (datetime.fromtimestamp(fetched_at) if fetched_at else datetime.now()).isoformat()
+    }
+
+def _get_quote(ticker, full=False):
+    """
+    Return the quote record for ticker, from cache when fresh.
+
+    full=True also requires name and currency, which the batch download does
+    not provide. Failures are negative-cached and raised as StockPriceError.
+    """
+    cached = _quote_cache.get(ticker)
+    if cached is not None:
+        if 'error' in cached:
+            raise StockPriceError(cached['error'])
+        if not full or 'name' in cached:
+            return cached
+
+    stale = _servable_stale_record(ticker, full)
+    if stale is not None:
+        # Only callers that need the name and currency pay for a full lookup
+        _schedule_refresh([ticker], full=full)
+        return stale
+
+    # Providers in FINSIGHT_QUOTE_PROVIDERS order, failing over on errors and slow responses
+    record = _load_quote(ticker)
+
+    if record is None:
+        # Every provider failed or has its circuit breaker open: an old quote beats an error
+        last_good = _quote_cache.peek(ticker)
+        if last_good and last_good.get('price') and (not full or 'name' in last_good):
+            return last_good
+        message = f"Unable to fetch price for {ticker}"
+        _quote_cache.set_error(ticker, message)
+        raise StockPriceError(message)
+
+    if not record.get('price'):
+        raise StockPriceError(record.get('error') or f"Unable to fetch price for {ticker}")
+    return record
+
+def _load_quote(ticker):
+    """
+    Quote record for ticker from the providers, cached before anyone else can ask again.
+
+    Concurrent lookups of one symbol (price, info, validation, refresh) share a
+    single flight, and the flight re-checks and fills the cache itself, so a
+    caller arriving just as it ends finds the answer instead of calling a
+    provider again. Returns the record (without a price, or a cached
+    {'error': ...} record, for a symbol the providers don't know), or None if
+    every provider failed or the flight outlasted FETCH_DEADLINE.
+    """
+    with tracing.span("provider"):
+        try:
+            return _inflight_quotes.do(ticker, _fetch_and_store_quote, ticker, timeout=FETCH_DEADLINE)
+        except TimeoutError as e:
+            print(f"Warning: {e}")
+            return None
+
+def _fetch_and_store_quote(ticker):
+    """Body of a quote flight; the previous flight may have just stored what we need"""
+    cached = _quote_cache.get(ticker, count=False)
+    if cached is not None and ('error' in cached or 'name' in cached):
+        return cached
+    record = _fetch_quote(ticker)
+    if record and record.get('price'):
+        _quote_cache.set(ticker, record)
+    elif record is not None and _quote_cache.peek(ticker) is None:
+        # Unknown symbol; one that was priced before keeps serving its last good quote
+        _quote_cache.set_error(ticker, f"Unable to fetch price for {ticker}")
+    return record
+
+def _fetch_quote(ticker):
+    """Quote record from the first provider that answers; None if every provider failed"""
+    return _quote_providers.fetch_quote(ticker)
+
+def _fetch_history_yfinance(ticker, start):
+    """Daily bars for ticker from start (inclusive) using yfinance"""
+    hist = yf.Ticker(ticker).history(start=start.isoformat(), auto_adjust=False)
+    return bars_from_frame(hist)
+
+# Local daily bars; only bars newer than the last stored date are downloaded
+_history_store = HistoryStore(fetch_bars=_fetch_history_yfinance, live_bar_ttl=_cache_duration)
+
+# Quote sources in priority order; the yfinance one keeps its bars in the history store
+_quote_providers = build_providers(history_store=_history_store)
+_inflight_quotes = SingleFlight()
+# Batched price downloads, per symbol: a symbol in one request's batch isn't downloaded by another
+_inflight_batches = SingleFlight()
+
+def _fetch_quotes_batch(tickers):
+    """Fetch latest and previous closes for many tickers, in one request per provider where possible"""
+    if not tickers:
+        return {}
+    with tracing.span("provider"):
+        return _quote_providers.fetch_quotes(tickers)
+
+def _fetch_batch_into_cache(symbols):
+    """
+    Body of a batch flight: {symbol: record} for symbols, downloading only what
+    the cache doesn't already answer and merging the download into the cache
+    before the flight ends, so callers arriving right after find it there.
+    """
+    quotes = {}
+    missing = []
+    for symbol in symbols:
+        cached = _quote_cache.get(symbol, count=False)
+        if cached is not None:
+            quotes[symbol] = cached
+        else:
+            missing.append(symbol)
+    if missing:
+        # Merge so a full record from get_stock_info keeps its name and currency
+        fetched = _fetch_quotes_batch(missing)
+        quotes.update(_quote_cache.update_many({s: q for s, q in fetched.items() if q.get('price')}))
+    return quotes
+
+def _servable_stale_record(ticker, full=False):
+    """Expired record still within QUOTE_MAX_STALENESS, or None if the caller must wait"""
+    record = _quote_cache.peek(ticker)
+    if not record or not record.get('price') or (full and 'name' not in record):
         return None
-        
-    except Exception as e:
-        print(f"Alpha Vantage error for {ticker}: {e}")
+    fetched_at = record.get('fetched_at')
+    if fetched_at is None or time.time() - fetched_at > QUOTE_MAX_STALENESS:
         return None
+    return record
 
-def _is_price_cached(ticker):
-    """Check if price is in cache and still valid"""
-    if ticker not in _price_cache:
-        return False
-    
-    cache_time = _price_cache[ticker]['timestamp']
-    current_time = time.time()
-    
-    return (current_time - cache_time) < _cache_duration
+def _schedule_refresh(tickers, full=False):
+    """
+    Refresh tickers on the fetch pool, skipping any with a refresh already in flight.
 
-def _cache_price(ticker, price):
-    """Cache the price with timestamp"""
-    _price_cache[ticker] = {
-        'price': price,
-        'timestamp': time.time()
-    }
+    Prices are refreshed together with one batched download merged into the
+    cache, as QuoteRefresher does; full=True re-fetches each ticker's full
+    record (name, currency) instead.
+    """
+    with _refreshing_lock:
+        symbols = [t for t in dict.fromkeys(tickers) if t not in _refreshing]
+        _refreshing.update(symbols)
+    if not symbols:
+        return
+
+    def refresh():
+        try:
+            if full:
+                for symbol in symbols:
+                    _fetch_and_cache(symbol)
+            else:
+                refresh_quotes(symbols)
+        except Exception as e:
+            print(f"Warning: background quote refresh failed: {e!r}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.difference_update(symbols)
+
+    _get_fetch_executor().submit(refresh)
+
+def _fetch_and_cache(ticker):
+    """Fetch a full quote and cache it; failures leave the existing record alone"""
+    record = _load_quote(ticker)
+    if record and record.get('price'):
+        return record
+    return None
+
+def refresh_quotes(tickers):
+    """Re-fetch tickers with one batched download and merge the results into the cache"""
+    symbols = sorted({t.upper().strip() for t in tickers})
+    fetched = _fetch_quotes_batch(symbols)
+    _quote_cache.update_many({s: q for s, q in fetched.items() if q.get('price')})
+    return fetched
+
+class QuoteRefresher:
+    """
+    Daemon thread that keeps quotes for a changing set of tickers warm.
+
+    get_tickers is called on every pass so newly added holdings are picked up.
+    Tickers without a full record (name, currency) get one full lookup; the
+    rest are refreshed together with one batched download.
+    """
+
+    def __init__(self, get_tickers, interval=None):
+        self.get_tickers = get_tickers
+        self.interval = REFRESH_INTERVAL if interval is None else interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, skip_first=False):
+        """Refresh in the background; skip_first waits one interval before the first pass"""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(skip_first,), name="finsight-refresher",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_once(self):
+        tickers = sorted({t.upper().strip() for t in self.get_tickers()})
+        if not tickers:
+            return
+        need_full = [t for t in tickers if 'name' not in (_quote_cache.peek(t) or {})]
+        batched = [t for t in tickers if t not in need_full]
+        if batched:
+            refresh_quotes(batched)
+        if need_full:
+            fetch_concurrently(_fetch_and_cache, need_full)
+
+    def _run(self, skip_first=False):
+        if skip_first:
+            self._stop.wait(self.interval)
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Warning: background quote refresh failed: {e}")
+            self._stop.wait(self.interval)
+
+def prewarm(refresher, steps=None):
+    """
+    Load what a worker's first requests would otherwise wait for; returns seconds per step.
+
+    provider imports yfinance and opens the HTTP session, symbols reads the
+    symbol index, quotes runs one refresher pass over the held tickers.
+    """
+    steps = PREWARM_STEPS if steps is None else steps
+    timings = {}
+    for step in steps:
+        started = time.perf_counter()
+        try:
+            if step == "provider":
+                lazy.load(yf)
+                get_session()
+            elif step == "symbols":
+                len(_symbol_index)  # first use reads the file
+            elif step == "quotes":
+                refresher.run_once()
+            else:
+                print(f"Warning: unknown prewarm step {step!r}")
+                continue
+        except Exception as e:
+            print(f"Warning: prewarm step {step} failed: {e}")
+        timings[step] = time.perf_counter() - started
+    return timings
+
+def start_prewarm(refresher, steps=None):
+    """prewarm() on a daemon thread, then keep quotes fresh with refresher; returns the thread"""
+    steps = PREWARM_STEPS if steps is None else steps
+
+    def run():
+        prewarm(refresher, steps)
+        # A quotes step already did the refresher's first pass
+        refresher.start(skip_first="quotes" in steps)
+
+    thread = threading.Thread(target=run, name="finsight-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+def _stale_price(ticker):
+    """Return the last cached price for ticker even if it has expired"""
+    record = _quote_cache.peek(ticker)
+    return record.get('price') if record else None
 
 def clear_cache():
-    """Clear the price cache"""
-    global _price_cache
-    _price_cache = {}
+    """Clear the quote cache"""
+    _quote_cache.clear()
 
-def get_market_status():
+def get_provider_status():
+    """Circuit breaker state and recent latency of each quote provider"""
+    return _quote_providers.status()
+
+def get_cache_stats():
+    """Hit/miss/eviction counters for the quote cache, plus lookups that joined one in flight"""
+    stats = _quote_cache.stats()
+    stats['coalesced'] = _inflight_quotes.coalesced + _inflight_batches.coalesced
+    return stats
 
+@REGISTRY.collector
+def _collect_metrics():
+    """Quote cache counters and breaker state, read when /metrics is scraped"""
+    stats = get_cache_stats()
+    families = [
+        (f"finsight_quote_cache_{name}_total", "counter", help, [({}, stats[name])])
+        for name, help in (
+            ('hits', "Quote cache lookups served from memory"),
+            ('misses', "Quote cache lookups that had to go to a provider"),
+            ('disk_hits', "Quote cache misses filled from the shared disk cache"),
+            ('evictions', "Quotes dropped to stay under the cache size"),
+            ('expirations', "Quotes dropped after outliving the stale window"),
+            ('coalesced', "Quote lookups that joined one already in flight"),
+        )
+    ]
+    families.append(("finsight_quote_cache_entries", "gauge", "Quotes held in memory", [({}, stats['size'])]))
+    providers = get_provider_status()
+    families.append(("finsight_provider_breaker_open", "gauge", "1 while the provider's circuit breaker is open",
+                     [({'provider': p['provider']}, int(p['state'] == CircuitBreaker.OPEN)) for p in providers]))
+    families.append(("finsight_provider_breaker_trips_total", "counter", "Times the provider's breaker opened",
+                     [({'provider': p['provider']}, p['trips']) for p in providers]))
+    return families
+
+def get_market_status():
+    """"OPEN" or "CLOSED" from the local exchange calendar; "UNKNOWN" if it can't be worked out"""
     try:
-        # Use SPY as market indicator
-        spy = yf.Ticker("SPY")
-        hist = spy.history(period="1d")
-        
-        if not hist.empty:
-            last_update = hist.index[-1]
-            now = datetime.now()
-            
-            # Simple check: if last update is today, market is likely open
-            if last_update.date() == now.date():
-                return "OPEN"
-            else:
-                return "CLOSED"
-    except:
-        pass
-    
-    return "UNKNOWN"
+        return _market_calendar.status()
+    except Exception as e:
+        print(f"Warning: market status unavailable: {e}")
+        return "UNKNOWN"
 
 # Utility functions for error handling
 def is_valid_response(price):